@@ -0,0 +1,311 @@
+import sys
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+from PIL import Image
+import pypdf
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import pdf
+
+PDF_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdf.py')
+CORPUS_VERSION = 1
+SEED = 1234
+ENCRYPTED_PASSWORD = 'bench'
+RESULTS_VERSION = 1
+PEAK_RSS_MARKER = '__bench_peak_rss_kb__='
+# Runs pdf.py and reports its VmHWM on exit: ru_maxrss of a child starts at
+# the RSS the (much larger) benchmark process had when it forked.
+PEAK_RSS_PROBE = (
+    "import atexit, runpy, sys\n"
+    "def _report():\n"
+    "    with open('/proc/self/status') as f_status:\n"
+    "        hwm = [line.split()[1] for line in f_status if line.startswith('VmHWM:')]\n"
+    f"    sys.stderr.write('\\n{PEAK_RSS_MARKER}' + hwm[0] + '\\n')\n"
+    "atexit.register(_report)\n"
+    "sys.argv = sys.argv[1:]\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+)
+
+# page/file counts of the generated corpus
+SCALES = {
+    'quick': {'small_pages': 5, 'large_pages': 200, 'text_pages': 20, 'text_lines': 60,
+              'image_pages': 4, 'image_size': (640, 480), 'merge_files': 8, 'merge_pages': 5},
+    'full': {'small_pages': 10, 'large_pages': 2000, 'text_pages': 200, 'text_lines': 80,
+             'image_pages': 30, 'image_size': (1600, 1200), 'merge_files': 50, 'merge_pages': 20},
+}
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+         "et dolore magna aliqua ut enim ad minim veniam quis nostrud exercitation ullamco laboris").split()
+
+# spec, page count
+PAGE_SPEC_CASES = {
+    'parse_page_spec_ranges': (",".join(f"{i}-{i + 5}" for i in range(1, 200000, 10)), 1000000),
+    'parse_page_spec_steps': ("1-:3,2-:7,odd,last-1000-last", 1000000),
+    'parse_page_spec_singles': (",".join(str(i) for i in range(1, 100000, 3)), 1000000),
+}
+
+def _text_page_content(rng, lines):
+    out = [b"BT /F1 9 Tf 11 TL 40 800 Td"]
+    for _ in range(lines):
+        line = " ".join(rng.choice(WORDS) for _ in range(12))
+        out.append(b"(%s) '" % line.encode('ascii'))
+    out.append(b"ET")
+    return b"\n".join(out)
+
+def write_text_pdf(path, pages, lines, seed, password=None):
+    """Deterministic PDF of `pages` A4 pages with `lines` lines of Helvetica text each."""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for n in range(pages):
+        page = writer.add_blank_page(595, 842)
+        content = DecodedStreamObject()
+        content.set_data(b"BT /F1 14 Tf 40 820 Td (Page %d) Tj ET\n" % (n + 1) + _text_page_content(rng, lines))
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        page.compress_content_streams()
+    if password:
+        writer.encrypt(password, algorithm='RC4-128')
+    with open(path, "wb") as f_out:
+        writer.write(f_out)
+
+def _noise_image(size, seed, mode='RGB'):
+    rng = random.Random(seed)
+    width, height = size
+    # blocks of noise: compressible enough to look like a photo, not like a flat fill
+    small = Image.frombytes(mode, (width // 8, height // 8), rng.randbytes((width // 8) * (height // 8) * len(mode)))
+    return small.resize(size, Image.Resampling.BILINEAR)
+
+def write_image_pdf(path, pages, size, seed):
+    images = [_noise_image(size, seed + n) for n in range(pages)]
+    images[0].save(path, "PDF", resolution=150, save_all=True, append_images=images[1:])
+
+def generate_corpus(corpus_dir, scale='quick'):
+    """
+    Writes the benchmark corpus to `corpus_dir` unless a corpus of the same
+    version and scale is already there. Returns its manifest (name -> path).
+    """
+    params = SCALES[scale]
+    manifest_path = os.path.join(corpus_dir, 'corpus.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f_manifest:
+            manifest = json.load(f_manifest)
+        if manifest.get('version') == CORPUS_VERSION and manifest.get('scale') == scale:
+            return manifest['files']
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    files = {}
+
+    def corpus_path(name):
+        files[os.path.splitext(name)[0]] = path = os.path.join(corpus_dir, name)
+        return path
+
+    write_text_pdf(corpus_path('small.pdf'), params['small_pages'], 10, SEED)
+    write_text_pdf(corpus_path('large.pdf'), params['large_pages'], 10, SEED + 1)
+    write_text_pdf(corpus_path('text_heavy.pdf'), params['text_pages'], params['text_lines'], SEED + 2)
+    write_text_pdf(corpus_path('encrypted.pdf'), params['small_pages'], 10, SEED + 3, ENCRYPTED_PASSWORD)
+    write_image_pdf(corpus_path('image_heavy.pdf'), params['image_pages'], params['image_size'], SEED + 4)
+    files['merge_set'] = []
+    for n in range(params['merge_files']):
+        path = os.path.join(corpus_dir, f'merge_{n:03d}.pdf')
+        write_text_pdf(path, params['merge_pages'], 10, SEED + 100 + n)
+        files['merge_set'].append(path)
+    write_text_pdf(corpus_path('overlay.pdf'), 1, 3, SEED + 5)
+    logo = _noise_image((400, 200), SEED + 6, 'RGBA')
+    logo.save(corpus_path('overlay_logo.png'))
+    _noise_image((2400, 1600), SEED + 7).save(corpus_path('overlay_photo.jpg'), quality=85)
+
+    with open(manifest_path, "w", encoding='utf-8') as f_manifest:
+        json.dump({'version': CORPUS_VERSION, 'scale': scale, 'files': files}, f_manifest, indent=2)
+    return files
+
+def benchmark_cases(files, out_dir):
+    """Name -> pdf.py arguments for every operation of the command line tool."""
+    def out(name):
+        return os.path.join(out_dir, name)
+    return {
+        'merge_many_files': ['--operation', 'merge', '--input', *files['merge_set'], '--output', out('merge.pdf')],
+        'rotate_large': ['--operation', 'rotate', '--input', files['large'], '--output', out('rotate.pdf'),
+                         '--angle', '90', '--pages', 'odd'],
+        'delete_pages_large': ['--operation', 'delete_pages', '--input', files['large'], '--output', out('delete.pdf'),
+                               '--pages', '2-:3'],
+        'extract_pages_large': ['--operation', 'extract_pages', '--input', files['large'], '--output', out('extract.pdf'),
+                                '--pages', '1-:2'],
+        'encrypt_text_heavy': ['--operation', 'encrypt', '--input', files['text_heavy'], '--output', out('encrypt.pdf'),
+                               '--user-password', ENCRYPTED_PASSWORD],
+        'decrypt_encrypted': ['--operation', 'decrypt', '--input', files['encrypted'], '--output', out('decrypt.pdf'),
+                              '--password', ENCRYPTED_PASSWORD],
+        'overlay_pdf_large': ['--operation', 'overlay', '--input', files['large'], '--output', out('overlay_pdf.pdf'),
+                              '--overlay-pdf', files['overlay']],
+        'overlay_png_large': ['--operation', 'overlay', '--input', files['large'], '--output', out('overlay_png.pdf'),
+                              '--overlay-pdf', files['overlay_logo'], '--overlay-position', 'bottom-right',
+                              '--overlay-scale', '0.3'],
+        'overlay_jpeg_small': ['--operation', 'overlay', '--input', files['small'], '--output', out('overlay_jpg.pdf'),
+                               '--overlay-pdf', files['overlay_photo'], '--overlay-position', 'fit'],
+        'extract_text_text_heavy': ['--operation', 'extract_text', '--input', files['text_heavy'],
+                                    '--output', out('text.txt')],
+        'extract_text_image_heavy': ['--operation', 'extract_text', '--input', files['image_heavy'],
+                                     '--output', out('image_text.txt')],
+        'reverse_pages_large': ['--operation', 'reverse_pages', '--input', files['large'], '--output', out('reverse.pdf')],
+        'duplicate_pages_image_heavy': ['--operation', 'duplicate_pages', '--input', files['image_heavy'],
+                                        '--output', out('duplicate.pdf'), '--pages', 'all', '--duplicate-count', '2'],
+    }
+
+def _output_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else None
+
+def run_case(argv, repeat):
+    """
+    Runs `pdf.py argv` `repeat` times as its own process, as the web
+    application does, and returns the median wall and CPU time, the
+    largest peak RSS and the size of the output.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        command = [sys.executable, PDF_SCRIPT, *argv]
+        if os.path.exists('/proc/self/status'):
+            command[1:1] = ['-c', PEAK_RSS_PROBE]
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stderr, _, reported_rss = stderr.partition(PEAK_RSS_MARKER)
+        if process.returncode != 0:
+            return {'error': stderr.strip(), 'exit_code': process.returncode}
+        if reported_rss.strip():
+            peak_rss = int(reported_rss.split()[0]) * 1024
+        else:
+            peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        runs.append({'wall_s': wall, 'cpu_s': usage.ru_utime + usage.ru_stime, 'peak_rss_bytes': peak_rss})
+    return {
+        'wall_s': round(statistics.median(run['wall_s'] for run in runs), 4),
+        'cpu_s': round(statistics.median(run['cpu_s'] for run in runs), 4),
+        'peak_rss_bytes': max(run['peak_rss_bytes'] for run in runs),
+        'output_bytes': _output_bytes(argv[argv.index('--output') + 1]),
+        'runs': len(runs),
+    }
+
+def run_page_spec_case(spec, num_pages, repeat):
+    """parse_page_spec() is timed in-process: spawning a process would only measure the import."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        selection = pdf.parse_page_spec(spec, num_pages)
+        len(selection)
+        walls.append(time.perf_counter() - start_wall)
+        cpus.append(time.process_time() - start_cpu)
+    return {
+        'wall_s': round(statistics.median(walls), 4),
+        'cpu_s': round(statistics.median(cpus), 4),
+        'peak_rss_bytes': None,
+        'output_bytes': None,
+        'runs': repeat,
+    }
+
+def run_benchmarks(corpus_dir, scale='quick', repeat=3, only=None):
+    files = generate_corpus(corpus_dir, scale)
+    out_dir = os.path.join(corpus_dir, 'out')
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    for name, argv in benchmark_cases(files, out_dir).items():
+        if only and name not in only:
+            continue
+        results[name] = run_case(argv, repeat)
+        print(f"{name}: {results[name]}", file=sys.stderr)
+    for name, (spec, num_pages) in PAGE_SPEC_CASES.items():
+        if only and name not in only:
+            continue
+        results[name] = run_page_spec_case(spec, num_pages, repeat)
+        print(f"{name}: {results[name]}", file=sys.stderr)
+    return {
+        'version': RESULTS_VERSION,
+        'scale': scale,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pypdf': pypdf.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def compare_results(baseline, current, threshold=0.10, min_seconds=0.05):
+    """
+    Returns a list of (case, metric, baseline, current, ratio) for every
+    metric of `current` that is worse than `baseline` by more than
+    `threshold` (timings also by more than `min_seconds`, to ignore noise).
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base or 'error' in base:
+            continue
+        if 'error' in result:
+            regressions.append((name, 'error', None, result['error'], None))
+            continue
+        for metric in ('wall_s', 'cpu_s', 'peak_rss_bytes', 'output_bytes'):
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if metric.endswith('_s') and new - old < min_seconds:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append((name, metric, old, new, round(new / old, 3)))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pdf.py operations on a generated PDF corpus.")
+    parser.add_argument('--corpus-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_corpus'),
+                        help="Where the corpus is generated (reused while its version and scale match).")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='quick', help="Corpus size.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case; the median is reported.")
+    parser.add_argument('--cases', help="Comma-separated case names to run (default: all).")
+    parser.add_argument('--output', help="Write the results JSON here (default: stdout).")
+    parser.add_argument('--compare', metavar='BASELINE_JSON',
+                        help="Compare against saved results and exit with 1 if anything regressed.")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative slowdown/growth counted as a regression (default 0.10).")
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help="Timing differences below this are treated as noise (default 0.05).")
+    args = parser.parse_args()
+
+    only = set(args.cases.split(',')) if args.cases else None
+    current = run_benchmarks(args.corpus_dir, args.scale, args.repeat, only)
+    if args.output:
+        with open(args.output, "w", encoding='utf-8') as f_out:
+            json.dump(current, f_out, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f_baseline:
+            baseline = json.load(f_baseline)
+        if baseline.get('scale') != current['scale']:
+            print(f"warning: baseline scale '{baseline.get('scale')}' differs from '{current['scale']}'", file=sys.stderr)
+        regressions = compare_results(baseline, current, args.threshold, args.min_seconds)
+        for name, metric, old, new, ratio in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new}" + (f" (x{ratio})" if ratio else ""), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("no regressions", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,41 @@
 import sys
-from pypdf import PdfWriter, PdfReader
+import time
+_IMPORT_STARTED = time.perf_counter()
+from pypdf import PdfWriter, PdfReader, PageObject
 from pypdf.errors import PdfReadError, WrongPasswordError
+from pypdf.generic import (ArrayObject, ByteStringObject, DecodedStreamObject, DictionaryObject, FloatObject,
+                           IndirectObject, NameObject, NullObject, NumberObject, StreamObject)
 import argparse
+import concurrent.futures
+import concurrent.futures.process
+import contextlib
+import cProfile
+import gc
 from PIL import Image
 import os
 import io
+import bisect
+import collections
+import hashlib
+import hmac
+import math
+import mmap
+import heapq
+import itertools
+import re
+import resource
+import shutil
+import json
+import multiprocessing
+import signal
+import socketserver
+import stat
+import tempfile
+import threading
+import unicodedata
+import zlib
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 ERR_INVALID_ARGUMENT = "INVALID_ARGUMENT"
 ERR_FILE_PROCESSING = "FILE_PROCESSING_ERROR"
@@ -12,68 +43,984 @@ ERR_PAGE_RANGE = "PAGE_RANGE_ERROR"
 ERR_IO = "IO_ERROR"
 ERR_UNEXPECTED = "UNEXPECTED_ERROR"
 ERR_DECRYPTION_FAILED = "DECRYPTION_FAILED"
+ERR_DEADLINE_EXCEEDED = "DEADLINE_EXCEEDED"
+ERR_CANCELLED = "CANCELLED"
+
+class PageSelection:
+    """
+    Set of 0-indexed pages stored as ranges instead of one entry per page.
+    Plain ranges are merged and searched with bisect; stepped ranges (odd,
+    even, 1-last:3) are kept as range objects, which answer `in` in O(1).
+    len() and iteration never expand the selection into a list.
+    Iteration yields pages in ascending order without duplicates.
+    """
+    # beyond this many stepped ranges len() counts by iterating instead
+    MAX_INCLUSION_EXCLUSION = 8
+
+    def __init__(self, ranges=()):
+        plain, stepped = [], []
+        for r in ranges:
+            if len(r) == 0:
+                continue
+            if r.step == 1 or len(r) == 1:
+                plain.append(range(r[0], r[-1] + 1))
+            else:
+                stepped.append(range(r[0], r[-1] + 1, r.step))
+        plain.sort(key=lambda r: r.start)
+        merged = []
+        for r in plain:
+            if merged and r.start <= merged[-1].stop:
+                if r.stop > merged[-1].stop:
+                    merged[-1] = range(merged[-1].start, r.stop)
+            else:
+                merged.append(r)
+        self._runs = merged
+        self._starts = [r.start for r in merged]
+        self._stepped = [r for r in stepped if not self._covered(r)]
+        self._len = None
+
+    @classmethod
+    def all(cls, num_total_pages):
+        return cls([range(num_total_pages)])
+
+    def _run_index(self, page):
+        idx = bisect.bisect_right(self._starts, page) - 1
+        return idx if idx >= 0 and page < self._runs[idx].stop else -1
+
+    def _covered(self, r):
+        idx = self._run_index(r[0])
+        return idx >= 0 and r[-1] < self._runs[idx].stop
+
+    def __contains__(self, page):
+        if not isinstance(page, int):
+            return False
+        return self._run_index(page) >= 0 or any(page in r for r in self._stepped)
+
+    def _outside_runs(self, r):
+        # pages of the stepped range `r` not already counted in a plain run
+        total = len(r)
+        idx = max(bisect.bisect_right(self._starts, r.start) - 1, 0)
+        while idx < len(self._runs) and self._runs[idx].start < r.stop:
+            total -= _range_count(r, self._runs[idx].start, self._runs[idx].stop)
+            idx += 1
+        return total
+
+    def __len__(self):
+        if self._len is None:
+            total = sum(len(r) for r in self._runs)
+            if len(self._stepped) > self.MAX_INCLUSION_EXCLUSION:
+                total = sum(1 for _ in self)
+            else:
+                # inclusion-exclusion over the stepped ranges; intersections
+                # of stepped ranges are stepped ranges again
+                def add(first, current, sign):
+                    nonlocal total
+                    for k in range(first, len(self._stepped)):
+                        common = self._stepped[k] if current is None else _range_intersection(current, self._stepped[k])
+                        if common:
+                            total += sign * self._outside_runs(common)
+                            add(k + 1, common, -sign)
+                add(0, None, 1)
+            self._len = total
+        return self._len
+
+    def __bool__(self):
+        return bool(self._runs or self._stepped)
+
+    def __iter__(self):
+        if not self._stepped:
+            for r in self._runs:
+                yield from r
+            return
+        previous = None
+        for page in heapq.merge(*self._runs, *self._stepped):
+            if page != previous:
+                yield page
+                previous = page
+
+    def __repr__(self):
+        return f"PageSelection({self._runs + self._stepped!r})"
+
+def _range_count(r, lo, hi):
+    """Number of pages of the range `r` (positive step) within [lo, hi)."""
+    lo, hi = max(lo, r.start), min(hi, r.stop)
+    if lo >= hi:
+        return 0
+    first = r.start + -(-(lo - r.start) // r.step) * r.step
+    return (hi - 1 - first) // r.step + 1 if first < hi else 0
+
+def _range_intersection(a, b):
+    """Pages in both ranges `a` and `b` (positive steps) as one range, or None."""
+    gcd = math.gcd(a.step, b.step)
+    if (b.start - a.start) % gcd:
+        return None
+    modulus = b.step // gcd
+    k = (b.start - a.start) // gcd * pow(a.step // gcd, -1, modulus) % modulus if modulus > 1 else 0
+    step = a.step * modulus
+    first = a.start + a.step * k
+    lo = max(a.start, b.start)
+    if first < lo:
+        first += -(-(lo - first) // step) * step
+    stop = min(a.stop, b.stop)
+    return range(first, stop, step) if first < stop else None
+
+_PAGE_ENDPOINT = r"(?:\d+|last(?:-\d+)?)"
+_PAGE_SINGLE_RE = re.compile(rf"^({_PAGE_ENDPOINT})$")
+# white-space around '-' and ':' is allowed, as int() did for the original '1 - 3' form
+_PAGE_RANGE_RE = re.compile(rf"^({_PAGE_ENDPOINT})?\s*-\s*({_PAGE_ENDPOINT})?(?:\s*:\s*(\d+))?$")
+
+def _page_endpoint(token, num_total_pages):
+    """1-indexed page number for '7', 'last' or 'last-2'."""
+    if token.startswith('last'):
+        return num_total_pages - int(token[5:] or 0)
+    return int(token)
 
 def parse_page_spec(page_spec_str, num_total_pages):
+    """
+    Parses a 1-indexed page specification into a PageSelection of 0-indexed
+    pages. Comma separated parts may be:
+      '5'         a single page; 'last' and 'last-K' count from the end
+      '3-7'       a range; either end may be omitted ('3-' to the end, '-7' from the start)
+      '1-last:3'  a range taking every 3rd page
+      'odd', 'even', 'all'
+    """
     if not page_spec_str or page_spec_str.lower() == 'all':
-        if num_total_pages == 0:
-            return []
-        return list(range(num_total_pages))
+        return PageSelection.all(num_total_pages)
 
-    selected_pages = set()
+    ranges = []
     parts = page_spec_str.split(',')
     for part in parts:
         part = part.strip()
+        token = part.lower()
+        if token in ('odd', 'even'):
+            ranges.append(range(0 if token == 'odd' else 1, num_total_pages, 2))
+            continue
+        single = _PAGE_SINGLE_RE.match(token)
+        if single:
+            page_num = _page_endpoint(single.group(1), num_total_pages) - 1
+            if not (0 <= page_num < num_total_pages):
+                raise ValueError(f"{ERR_PAGE_RANGE}::Invalid page number: '{part}' for PDF with {num_total_pages} pages (1-indexed).")
+            ranges.append(range(page_num, page_num + 1))
+            continue
+        match = _PAGE_RANGE_RE.match(token)
+        if not match or not (match.group(1) or match.group(2)):
+            raise ValueError(f"{ERR_PAGE_RANGE}::Invalid character in page specification: '{part}'. Use numbers, commas, hyphens, 'last', 'odd', 'even' and ':step'.")
+        start_str, end_str, step_str = match.groups()
+        if num_total_pages == 0:
+            raise ValueError(f"{ERR_PAGE_RANGE}::Cannot parse range '{part}' for an empty PDF.")
+        start = _page_endpoint(start_str, num_total_pages) - 1 if start_str else 0
+        end = _page_endpoint(end_str, num_total_pages) - 1 if end_str else num_total_pages - 1
+        step = int(step_str) if step_str else 1
+        if not (0 <= start < num_total_pages and 0 <= end < num_total_pages and start <= end and step >= 1):
+            raise ValueError(f"{ERR_PAGE_RANGE}::Invalid page range: '{part}' for PDF with {num_total_pages} pages (1-indexed).")
+        ranges.append(range(start, end + 1, step))
+    selected_pages = PageSelection(ranges)
+    if not selected_pages and num_total_pages > 0:
+        raise ValueError(f"{ERR_PAGE_RANGE}::Page specification '{page_spec_str}' resulted in no pages selected for a PDF with {num_total_pages} pages.")
+    return selected_pages
+
+
+METRICS_PHASES = ('open', 'page_loop', 'optimize', 'encrypt', 'serialize', 'fsync')
+
+class OperationMetrics:
+    """
+    Wall time per phase and counters of one operation run. Phases are
+    accumulated by metrics_phase() blocks (also from writer threads); the
+    page loop is whatever the run spent outside the measured phases.
+    """
+
+    def __init__(self):
+        self.phases = collections.defaultdict(float)
+        self.counters = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
         try:
-            if '-' in part:
-                start_str, end_str = part.split('-', 1)
-                start = int(start_str) - 1
-                if end_str == '':
-                    if num_total_pages == 0:
-                         raise ValueError(f"{ERR_PAGE_RANGE}::Cannot parse range ending with '-' for an empty PDF.")
-                    end = num_total_pages -1
-                else:
-                    end = int(end_str) - 1
-                if not (0 <= start < num_total_pages and 0 <= end < num_total_pages and start <= end):
-                    raise ValueError(f"{ERR_PAGE_RANGE}::Invalid page range: '{part}' for PDF with {num_total_pages} pages (1-indexed).")
-                selected_pages.update(range(start, end + 1))
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] += elapsed
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+_current_metrics = OperationMetrics()
+
+def metrics_phase(name):
+    return _current_metrics.phase(name)
+
+def metrics_count(name, value=1):
+    _current_metrics.count(name, value)
+
+def _process_io_counters():
+    # characters read/written through syscalls by this process (Linux only)
+    try:
+        with open('/proc/self/io') as f_io:
+            fields = dict(line.split(':') for line in f_io)
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _path_bytes(path):
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path) if os.path.isfile(path) else None
+
+class OperationAborted(BaseException):
+    """
+    Raised between pages when the run passes its --deadline-seconds or is
+    cancelled by SIGTERM. Like KeyboardInterrupt it derives from
+    BaseException, so the operations' `except Exception` handlers let it
+    through to the caller unchanged.
+    """
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}::{message}")
+        self.code = code
+
+class RunControl:
+    """
+    Progress reporting (NDJSON lines on stderr or appended to a file) and
+    the deadline/cancellation checks of the current run.
+    """
+    PROGRESS_INTERVAL_SECONDS = 0.2
+
+    def __init__(self, operation=None, progress=None, deadline_seconds=None):
+        self.operation = operation
+        self.progress = progress
+        self.deadline_seconds = deadline_seconds
+        self.started = time.monotonic()
+        self.deadline = None if deadline_seconds is None else self.started + deadline_seconds
+        self.cancelled = False
+        self._last_report = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        if self.cancelled:
+            raise OperationAborted(ERR_CANCELLED, f"Operation '{self.operation}' was cancelled.")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise OperationAborted(ERR_DEADLINE_EXCEEDED, f"Operation '{self.operation}' exceeded its deadline of {self.deadline_seconds:g} seconds.")
+
+    def report(self, phase, done=None, total=None):
+        if not self.progress:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # page updates are throttled; phase changes and the last page always get a line
+            if (done is not None and done != total and self._last_report is not None
+                    and now - self._last_report < self.PROGRESS_INTERVAL_SECONDS):
+                return
+            self._last_report = now
+            line = json.dumps({'progress': {'operation': self.operation, 'phase': phase, 'done': done, 'total': total,
+                                            'elapsed_s': round(now - self.started, 3)}})
+            if self.progress == 'stderr':
+                print(line, file=sys.stderr, flush=True)
             else:
-                page_num = int(part) - 1
-                if not (0 <= page_num < num_total_pages):
-                    raise ValueError(f"{ERR_PAGE_RANGE}::Invalid page number: '{part}' for PDF with {num_total_pages} pages (1-indexed).")
-                selected_pages.add(page_num)
-        except ValueError as e:
-            if str(e).startswith(ERR_PAGE_RANGE):
-                raise
+                with open(self.progress, "a", encoding='utf-8') as f_progress:
+                    f_progress.write(line + "\n")
+
+_current_run = RunControl()
+
+def track_progress(items, total=None, phase='pages'):
+    """
+    Yields `items`, checking the deadline and reporting progress before
+    each one: the page loops of all operations go through it.
+    """
+    run = _current_run
+    if total is None:
+        total = len(items)
+    done = 0
+    for item in items:
+        run.check()
+        run.report(phase, done, total)
+        yield item
+        done += 1
+    run.report(phase, done, total)
+
+def report_phase(phase):
+    """Deadline check and progress line before a step without page granularity (e.g. serialization)."""
+    _current_run.check()
+    _current_run.report(phase)
+
+def _request_cancel(signum, frame):
+    _current_run.cancelled = True
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+STDIO_STREAM = '-'
+# in-memory files standing in for --output - / fd:N; they are written in place
+_stream_output_paths = set()
+
+def is_stream_spec(spec):
+    """True for '-' (stdin/stdout) and 'fd:N' (an inherited file descriptor)."""
+    return spec == STDIO_STREAM or (spec.startswith('fd:') and spec[3:].isdigit())
+
+def _stream_fd(spec, stdio_fd):
+    return stdio_fd if spec == STDIO_STREAM else int(spec[3:])
+
+def _memory_file(name):
+    """
+    Returns (fd, path) of an anonymous in-memory file that can be reopened
+    by path any number of times, also by worker processes. Falls back to a
+    temporary file where memfd_create() is not available.
+    """
+    if hasattr(os, 'memfd_create') and os.path.isdir(f"/proc/{os.getpid()}/fd"):
+        fd = os.memfd_create(name)
+        return fd, f"/proc/{os.getpid()}/fd/{fd}"
+    fd, path = tempfile.mkstemp(prefix=f"{name}-")
+    return fd, path
+
+def open_stream_input(spec, memory_files):
+    """
+    Path from which the input given as '-' or 'fd:N' can be read: regular
+    files behind a descriptor are reopened through /proc without copying,
+    pipes are read once into an in-memory file.
+    """
+    fd = _stream_fd(spec, sys.stdin.fileno())
+    try:
+        mode = os.fstat(fd).st_mode
+    except OSError as e:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Cannot read input from {spec}: {e}")
+    if stat.S_ISREG(mode) and os.path.isdir(f"/proc/{os.getpid()}/fd"):
+        return f"/proc/{os.getpid()}/fd/{fd}"
+    memory_fd, path = _memory_file('pdf-input')
+    memory_files.append((memory_fd, path))
+    with os.fdopen(fd, "rb", closefd=False) as f_in, os.fdopen(memory_fd, "wb", closefd=False) as f_memory:
+        shutil.copyfileobj(f_in, f_memory, 1024 * 1024)
+    return path
+
+def open_stream_output(memory_files):
+    """In-memory file the operation writes to; copied to the stream when it succeeds."""
+    memory_fd, path = _memory_file('pdf-output')
+    memory_files.append((memory_fd, path))
+    _stream_output_paths.add(path)
+    return path
+
+def copy_to_stream(path, spec):
+    """Sends the finished output at `path` to stdout or the 'fd:N' descriptor."""
+    fd = _stream_fd(spec, sys.stdout.fileno())
+    sys.stdout.flush()
+    with open(path, "rb") as f_in:
+        size = os.fstat(f_in.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                offset += os.sendfile(fd, f_in.fileno(), offset, size - offset)
+        except OSError:
+            # sendfile() does not support every descriptor type
+            f_in.seek(offset)
+            with os.fdopen(fd, "wb", closefd=False) as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+def close_memory_files(memory_files):
+    for memory_fd, path in memory_files:
+        _stream_output_paths.discard(path)
+        with contextlib.suppress(OSError):
+            os.close(memory_fd)
+        if not path.startswith('/proc/'):
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+
+@contextlib.contextmanager
+def atomic_output(path, mode="wb", encoding=None):
+    """
+    Opens a temporary file next to `path` for writing. It is fsynced and
+    renamed over `path` only when the block completes, so a failed, aborted
+    or killed run never leaves a partial file at `path`. Outputs going to
+    a stream are buffered in memory and need no temporary file.
+    """
+    if path in _stream_output_paths:
+        with open(path, mode, encoding=encoding) as f_out:
+            yield f_out
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f_out:
+            yield f_out
+            with metrics_phase('fsync'):
+                f_out.flush()
+                os.fsync(f_out.fileno())
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+def open_pdf_reader(source, password=None, strict=False):
+    """
+    Opens a PDF and, when it is encrypted, decrypts it in memory with
+    `password` (or the empty user password), so operations can work on
+    encrypted inputs without a separate decrypt pass. Raises
+    WrongPasswordError when the password is missing or wrong.
+    """
+    with metrics_phase('open'):
+        reader = PdfReader(source, strict=strict)
+        if reader.is_encrypted and not reader.decrypt(password if password is not None else ""):
+            if password is None:
+                raise WrongPasswordError("a password is required to open this file")
+            raise WrongPasswordError("incorrect password")
+    return reader
+
+OPTIMIZE_LEVELS = (0, 1, 2)
+OBJECT_STREAM_SIZE = 100
+# dictionaries that may be shared when identical; streams always may. Anything
+# else (page tree nodes, annotations, optional content groups, structure
+# elements, ...) has an identity of its own and is never merged.
+SHAREABLE_OBJECT_TYPES = ('/Font', '/FontDescriptor', '/Encoding', '/ExtGState', '/XObject')
+
+class _ByteCounter:
+    """Write-only sink measuring the size of what a writer would produce."""
+    mode = 'wb'
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+def _replace_references(obj, replacements, writer):
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, DictionaryObject):
+            items = list(node.items())
+        elif isinstance(node, ArrayObject):
+            items = list(enumerate(node))
+        else:
+            continue
+        for key, value in items:
+            if isinstance(value, IndirectObject):
+                if value.idnum in replacements:
+                    node[key] = IndirectObject(replacements[value.idnum], 0, writer)
             else:
-                raise ValueError(f"{ERR_PAGE_RANGE}::Invalid character in page specification: '{part}'. Use numbers, commas, hyphens.")
-    if not selected_pages and num_total_pages > 0 and page_spec_str and page_spec_str.lower() != 'all':
-        raise ValueError(f"{ERR_PAGE_RANGE}::Page specification '{page_spec_str}' resulted in no pages selected for a PDF with {num_total_pages} pages.")
-    return sorted(list(selected_pages))
+                stack.append(value)
+
+def _referenced_numbers(obj):
+    """Object numbers `obj` refers to directly (without following the references)."""
+    numbers = []
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, IndirectObject):
+            numbers.append(node.idnum)
+        elif isinstance(node, DictionaryObject):
+            stack.extend(node.values())
+        elif isinstance(node, ArrayObject):
+            stack.extend(node)
+    return numbers
+
+def _is_shareable(obj):
+    return isinstance(obj, StreamObject) or (isinstance(obj, DictionaryObject) and obj.get('/Type') in SHAREABLE_OBJECT_TYPES)
+
+def _trailer_objects(writer):
+    return [obj for obj in (writer.root_object, writer._info, getattr(writer, '_encrypt_entry', None)) if obj is not None]
+
+def optimize_pdf_writer(writer):
+    """
+    Compresses streams stored without a filter, merges identical streams
+    and shareable dictionaries (fonts, font descriptors, encodings, graphics
+    states) into one and drops objects no longer reachable from the trailer.
+    Every object is hashed once, after the objects it refers to, so a font
+    whose descriptor was merged into an identical one merges as well.
+    Returns counters for the optimization report.
+    """
+    objects = writer._objects
+    stats = {'compressed_streams': 0, 'deduplicated_objects': 0, 'removed_objects': 0}
+    for i, obj in enumerate(objects):
+        if isinstance(obj, StreamObject) and '/Filter' not in obj and obj.get('/Type') != '/Metadata':
+            encoded = obj.flate_encode(9)
+            if len(encoded._data) < len(obj._data):
+                encoded.indirect_reference = obj.indirect_reference
+                objects[i] = encoded
+                stats['compressed_streams'] += 1
+
+    protected = {obj.indirect_reference.idnum for obj in _trailer_objects(writer)}
+    candidates = {number for number, obj in enumerate(objects, 1) if number not in protected and _is_shareable(obj)}
+    first_by_digest = {}
+    replacements = {}
+    done, visiting = set(), set()
+    for root in sorted(candidates):
+        # depth first, so the references of an object are already merged when it is hashed
+        stack = [(root, False)]
+        while stack:
+            number, children_done = stack.pop()
+            if not children_done:
+                if number in done or number in visiting:
+                    continue  # already hashed, or a reference cycle
+                visiting.add(number)
+                stack.append((number, True))
+                stack.extend((child, False) for child in _referenced_numbers(objects[number - 1])
+                             if child in candidates and child not in done)
+                continue
+            obj = objects[number - 1]
+            _replace_references(obj, replacements, writer)
+            buf = io.BytesIO()
+            obj.write_to_stream(buf)
+            first = first_by_digest.setdefault(hashlib.sha256(buf.getvalue()).digest(), number)
+            if first != number:
+                replacements[number] = first
+            visiting.discard(number)
+            done.add(number)
+    if replacements:
+        for number in replacements:
+            objects[number - 1] = None
+        for obj in objects:
+            if obj is not None:
+                _replace_references(obj, replacements, writer)
+    stats['deduplicated_objects'] = len(replacements)
+
+    reachable = set()
+    stack = list(_trailer_objects(writer))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, IndirectObject):
+            number = node.idnum
+            if number in reachable or not 0 < number <= len(objects) or objects[number - 1] is None:
+                continue
+            reachable.add(number)
+            stack.append(objects[number - 1])
+        elif isinstance(node, DictionaryObject):
+            stack.extend(node.values())
+        elif isinstance(node, ArrayObject):
+            stack.extend(node)
+    reachable.update(obj.indirect_reference.idnum for obj in _trailer_objects(writer))
+    for number, obj in enumerate(objects, 1):
+        if obj is not None and number not in reachable:
+            objects[number - 1] = None
+            stats['removed_objects'] += 1
+    return stats
+
+def _write_with_object_streams(writer, f_out):
+    """
+    Serializes an unencrypted `writer` like PdfWriter.write(), but with every
+    non-stream object packed into compressed object streams indexed by an
+    xref stream (PDF 1.5).
+    """
+    objects = writer._objects
+    entries = {}
+    packed = []
+
+    def write_object(number, data):
+        entries[number] = (1, f_out.tell(), 0)
+        f_out.write(b"%d 0 obj\n" % number + data + b"\nendobj\n")
+
+    f_out.write(max(writer.pdf_header, '%PDF-1.5').encode('ascii') + b"\n%\xe2\xe3\xcf\xd3\n")
+    for number, obj in enumerate(objects, 1):
+        if obj is None:
+            continue
+        buf = io.BytesIO()
+        obj.write_to_stream(buf)
+        if isinstance(obj, StreamObject):
+            write_object(number, buf.getvalue())
+        else:
+            packed.append((number, buf.getvalue()))
+
+    next_number = len(objects) + 1
+    for start in range(0, len(packed), OBJECT_STREAM_SIZE):
+        chunk = packed[start:start + OBJECT_STREAM_SIZE]
+        index = []
+        offset = 0
+        for i, (number, data) in enumerate(chunk):
+            index.append(b"%d %d" % (number, offset))
+            offset += len(data) + 1
+            entries[number] = (2, next_number, i)
+        first = b" ".join(index) + b"\n"
+        data = zlib.compress(first + b"\n".join(data for _, data in chunk))
+        write_object(next_number, b"<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n"
+                     % (len(chunk), len(first), len(data)) + data + b"\nendstream")
+        next_number += 1
+
+    xref_offset = f_out.tell()
+    entries[next_number] = (1, xref_offset, 0)
+    size = next_number + 1
+    width = max(1, (xref_offset.bit_length() + 7) // 8)
+    rows = []
+    for number in range(size):
+        kind, field2, field3 = entries.get(number, (0, 0, 65535 if number == 0 else 0))
+        rows.append(bytes([kind]) + field2.to_bytes(width, 'big') + field3.to_bytes(2, 'big'))
+    data = zlib.compress(b"".join(rows))
+    trailer = DictionaryObject({
+        NameObject('/Type'): NameObject('/XRef'),
+        NameObject('/Size'): NumberObject(size),
+        NameObject('/W'): ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)]),
+        NameObject('/Root'): writer.root_object.indirect_reference,
+        NameObject('/Filter'): NameObject('/FlateDecode'),
+        NameObject('/Length'): NumberObject(len(data)),
+    })
+    if writer._info is not None:
+        trailer[NameObject('/Info')] = writer._info.indirect_reference
+    if writer._ID is not None:
+        trailer[NameObject('/ID')] = writer._ID
+    buf = io.BytesIO()
+    trailer.write_to_stream(buf)
+    f_out.write(b"%d 0 obj\n" % next_number + buf.getvalue() + b"\nstream\n" + data + b"\nendstream\nendobj\n")
+    f_out.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+class _BitWriter:
+    """Big-endian bit packer for the hint tables of linearized files."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._bits = 0
+        self._count = 0
+
+    def write(self, value, bits):
+        self._bits = (self._bits << bits) | value
+        self._count += bits
+        while self._count >= 8:
+            self._count -= 8
+            self.data.append((self._bits >> self._count) & 0xFF)
+        self._bits &= (1 << self._count) - 1
+
+    def write_items(self, values, bits):
+        # every item of a hint table starts on a byte boundary
+        for value in values:
+            self.write(value, bits)
+        if self._count:
+            self.write(0, 8 - self._count)
+
+def _object_references(obj):
+    """Object numbers referenced by `obj`, not following /Parent back up the page tree."""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, IndirectObject):
+            yield item.idnum
+        elif isinstance(item, DictionaryObject):
+            stack.extend(value for key, value in item.items() if key != '/Parent')
+        elif isinstance(item, ArrayObject):
+            stack.extend(item)
+
+def _renumbered(obj, numbers):
+    """Copy of `obj` with its references translated through `numbers` (old -> new object number)."""
+    if isinstance(obj, IndirectObject):
+        return IndirectObject(numbers[obj.idnum], 0, None) if obj.idnum in numbers else NullObject()
+    if isinstance(obj, StreamObject):
+        copy = StreamObject()
+        copy._data = obj._data
+        copy.update({key: _renumbered(value, numbers) for key, value in obj.items()})
+        return copy
+    if isinstance(obj, DictionaryObject):
+        return DictionaryObject({key: _renumbered(value, numbers) for key, value in obj.items()})
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_renumbered(value, numbers) for value in obj)
+    return obj
+
+def _hint_stream_data(objects, first_page, pages, shared, lengths, offsets, numbers):
+    """
+    Page offset and shared object hint tables (PDF 32000-1 F.4) of a
+    linearized file. `first_page` and the entries of `pages` (the other
+    pages) are the object lists of each page section, `shared` those of the
+    shared objects section; `offsets` are computed as if the hint stream was
+    not in the file. Returns (data, offset of the shared object table).
+    Content stream offsets/lengths are given as whole page ranges and no
+    fractional positions are used, like other writers do.
+    """
+    shared_ids = {number: n for n, number in enumerate(first_page + shared)}
+    sections = [first_page] + pages
+    page_objects = [len(section) for section in sections]
+    page_lengths = [sum(lengths[number] for number in section) for section in sections]
+    references = [[]]
+    for section in pages:
+        owned = set(section)
+        references.append(sorted({shared_ids[ref] for number in section
+                                  for ref in _object_references(objects[number]) if ref in shared_ids and ref not in owned}))
+
+    def bits(values):
+        return max(values, default=0).bit_length()
+
+    min_objects, min_length = min(page_objects), min(page_lengths)
+    object_deltas = [count - min_objects for count in page_objects]
+    length_deltas = [length - min_length for length in page_lengths]
+    shared_counts = [len(refs) for refs in references]
+    identifier_bits = bits([len(shared_ids) - 1])
+    table = _BitWriter()
+    for value, width in ((min_objects, 32), (offsets[first_page[0]], 32), (bits(object_deltas), 16),
+                         (min_length, 32), (bits(length_deltas), 16), (0, 32), (0, 16),
+                         (min_length, 32), (bits(length_deltas), 16), (bits(shared_counts), 16),
+                         (identifier_bits, 16), (0, 16), (1, 16)):
+        table.write(value, width)
+    table.write_items(object_deltas, bits(object_deltas))
+    table.write_items(length_deltas, bits(length_deltas))
+    table.write_items(shared_counts, bits(shared_counts))
+    table.write_items([ref for refs in references for ref in refs], identifier_bits)
+    table.write_items([], 0)  # shared object numerators
+    table.write_items([0] * len(sections), 0)  # content stream offsets
+    table.write_items(length_deltas, bits(length_deltas))  # content stream lengths
+    shared_table_offset = len(table.data)
+
+    group_lengths = [lengths[number] for number in first_page + shared]
+    min_group = min(group_lengths)
+    group_deltas = [length - min_group for length in group_lengths]
+    for value, width in ((numbers[shared[0]] if shared else 0, 32), (offsets[shared[0]] if shared else 0, 32),
+                         (len(first_page), 32), (len(group_lengths), 32), (0, 16),
+                         (min_group, 32), (bits(group_deltas), 16)):
+        table.write(value, width)
+    table.write_items(group_deltas, bits(group_deltas))
+    table.write_items([0] * len(group_lengths), 1)  # no MD5 signatures
+    table.write_items([0] * len(group_lengths), 0)  # one object per group
+    return bytes(table.data), shared_table_offset
+
+def _write_linearized(writer, f_out):
+    """
+    Serializes `writer` as a linearized ("fast web view") PDF (PDF 32000-1
+    Annex F): the linearization dictionary, the first-page cross-reference
+    table, the catalog, the hint stream and everything needed to display
+    the first page come first, followed by the other pages in order, the
+    objects shared between them and the remaining objects, indexed by the
+    main cross-reference table at the end. Objects are renumbered so every
+    page section is a run of consecutive numbers, as the hint tables expect.
+    """
+    objects = {number: obj for number, obj in enumerate(writer._objects, 1) if obj is not None}
+    catalog = writer.root_object.indirect_reference.idnum
+    page_numbers = [page.indirect_reference.idnum for page in writer.pages]
+    encrypt = writer._encrypt_entry.indirect_reference.idnum if writer._encrypt_entry is not None else None
+    page_tree = set()
+    stack = [writer.root_object['/Pages'].indirect_reference.idnum]
+    while stack:
+        node = stack.pop()
+        if node in page_tree or node not in objects or '/Kids' not in objects[node]:
+            continue
+        page_tree.add(node)
+        stack.extend(kid.idnum for kid in objects[node]['/Kids'] if isinstance(kid, IndirectObject))
+    boundary = page_tree | set(page_numbers) | {catalog}
+
+    # objects each page needs, in the order they are reached
+    owners = collections.defaultdict(set)
+    reached = []
+    for n, page in enumerate(page_numbers):
+        order, seen = [page], {page}
+        for number in order:
+            for ref in _object_references(objects[number]):
+                if ref not in seen and ref in objects and ref not in boundary:
+                    seen.add(ref)
+                    order.append(ref)
+        for number in order:
+            owners[number].add(n)
+        reached.append(order)
+    first_page = reached[0]
+    pages = [[number for number in order if owners[number] == {n}] for n, order in enumerate(reached[1:], 1)]
+    shared = list(dict.fromkeys(number for order in reached[1:] for number in order
+                                if len(owners[number]) > 1 and 0 not in owners[number]))
+    document = [catalog] + ([encrypt] if encrypt else [])
+    placed = set(first_page).union(document, shared, *pages)
+    other = [number for number in objects if number not in placed]
+
+    # the main cross-reference section holds objects 1.., the first-page
+    # section the ones after it: linearization dict, document, hint stream, first page
+    main_order = [number for section in pages for number in section] + shared + other
+    numbers = {number: n for n, number in enumerate(main_order, 1)}
+    linearization_number = len(main_order) + 1
+    numbers.update((number, n) for n, number in enumerate(document, linearization_number + 1))
+    hint_number = linearization_number + 1 + len(document)
+    numbers.update((number, n) for n, number in enumerate(first_page, hint_number + 1))
+    size = hint_number + 1 + len(first_page)
 
+    def chunk(number, obj):
+        buf = io.BytesIO()
+        obj.write_to_stream(buf)
+        return b"%d 0 obj\n" % number + buf.getvalue() + b"\nendobj\n"
+
+    chunks = {}
+    for number, obj in objects.items():
+        obj = _renumbered(obj, numbers)
+        if writer._encryption is not None and number != encrypt:
+            obj = writer._encryption.encrypt_object(obj, numbers[number], 0)
+        chunks[number] = chunk(numbers[number], obj)
+    lengths = {number: len(data) for number, data in chunks.items()}
+
+    def linearization_dict(length, hint_offset, hint_length, first_page_end, main_xref_entries):
+        return (b"%d 0 obj\n<< /Linearized 1 /L %d /H [ %d %d ] /O %d /E %d /N %d /T %d >>"
+                % (linearization_number, length, hint_offset, hint_length, numbers[page_numbers[0]],
+                   first_page_end, len(page_numbers), main_xref_entries))
+
+    def first_page_xref(entry_offsets, main_xref_offset):
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(size),
+            NameObject('/Root'): IndirectObject(numbers[catalog], 0, None),
+            NameObject('/Prev'): NumberObject(main_xref_offset),
+        })
+        if writer._info is not None and writer._info.indirect_reference.idnum in numbers:
+            trailer[NameObject('/Info')] = IndirectObject(numbers[writer._info.indirect_reference.idnum], 0, None)
+        if writer._ID is not None:
+            trailer[NameObject('/ID')] = writer._ID
+        if encrypt:
+            trailer[NameObject('/Encrypt')] = IndirectObject(numbers[encrypt], 0, None)
+        buf = io.BytesIO()
+        trailer.write_to_stream(buf)
+        return (b"xref\n%d %d\n" % (linearization_number, len(entry_offsets))
+                + b"".join(b"%010d 00000 n \n" % offset for offset in entry_offsets)
+                + b"trailer\n" + buf.getvalue())
+
+    def padded(data, width, end):
+        return data + b" " * (width - len(data) - len(end)) + end
+
+    # both blocks precede the offsets they contain: reserve their largest size
+    header = max(writer.pdf_header, '%PDF-1.4').encode('ascii') + b"\n%\xe2\xe3\xcf\xd3\n"
+    linearization_end, first_xref_end = b"\nendobj\n", b"\nstartxref\n0\n%%EOF\n"
+    widest = 10 ** 10 - 1
+    linearization_size = len(linearization_dict(*[widest] * 5) + linearization_end)
+    first_xref_entries = 1 + len(document) + 1 + len(first_page)
+    first_xref_size = len(first_page_xref([0] * first_xref_entries, widest) + first_xref_end)
+
+    offsets = {}
+    position = len(header) + linearization_size + first_xref_size
+    for number in document:
+        offsets[number] = position
+        position += lengths[number]
+    hint_offset = position
+    # offsets in the hint tables are computed as if there was no hint stream
+    for number in first_page + main_order:
+        offsets[number] = position
+        position += lengths[number]
+    hint_data, shared_table_offset = _hint_stream_data(objects, first_page, pages, shared, lengths, offsets, numbers)
+    hint = StreamObject()
+    hint._data = zlib.compress(hint_data)
+    hint[NameObject('/Filter')] = NameObject('/FlateDecode')
+    hint[NameObject('/S')] = NumberObject(shared_table_offset)
+    if writer._encryption is not None:
+        hint = writer._encryption.encrypt_object(hint, hint_number, 0)
+    hint_chunk = chunk(hint_number, hint)
+    for number in first_page + main_order:
+        offsets[number] += len(hint_chunk)
 
-def merge_pdfs(input_paths, output_path):
+    main_xref_offset = position + len(hint_chunk)
+    main_xref = b"xref\n0 %d\n" % linearization_number
+    main_table = b"0000000000 65535 f \n" + b"".join(b"%010d 00000 n \n" % offsets[number] for number in main_order)
+    first_xref_offset = len(header) + linearization_size
+    main_trailer = b"trailer\n<< /Size %d >>\nstartxref\n%d\n%%%%EOF\n" % (linearization_number, first_xref_offset)
+    file_length = main_xref_offset + len(main_xref) + len(main_table) + len(main_trailer)
+    first_page_end = offsets[first_page[-1]] + lengths[first_page[-1]]
+    # /T: the white-space before the first entry of the main table
+    linearization = linearization_dict(file_length, hint_offset, len(hint_chunk), first_page_end,
+                                       main_xref_offset + len(main_xref) - 1)
+    entry_offsets = [len(header)] + [offsets[number] for number in document] + [hint_offset] + [offsets[number] for number in first_page]
+    first_xref = first_page_xref(entry_offsets, main_xref_offset)
+
+    f_out.write(header + padded(linearization, linearization_size, linearization_end)
+                + padded(first_xref, first_xref_size, first_xref_end))
+    for number in document:
+        f_out.write(chunks[number])
+    f_out.write(hint_chunk)
+    for number in first_page + main_order:
+        f_out.write(chunks[number])
+    f_out.write(main_xref + main_table + main_trailer)
+
+def write_pdf(writer, output_path, output_options=None):
+    """
+    Final step of every operation producing a PDF. `output_options` may ask
+    to encrypt the result ({'encrypt': (user_password, owner_password)}),
+    to optimize it ({'optimize': level}: 1 runs optimize_pdf_writer(), 2
+    also writes object streams unless the output is encrypted or
+    linearized) and to linearize it ({'linearize': True}). A report with
+    the optimization counters, the input size ('input_bytes') and the output
+    size is appended to its 'optimize_stats' list; the size the output would
+    have had unoptimized costs a second serialization and is only measured
+    with {'measure_unoptimized': True}.
+    """
+    options = output_options or {}
+    level = options.get('optimize', 0)
+    metrics_count('pages', len(writer.pages))
+    if level:
+        report_phase('optimize')
+        with metrics_phase('optimize'):
+            if options.get('measure_unoptimized'):
+                unoptimized = _ByteCounter()
+                writer.write(unoptimized)
+            stats = optimize_pdf_writer(writer)
+    if options.get('encrypt'):
+        user_password, owner_password = options['encrypt']
+        with metrics_phase('encrypt'):
+            writer.encrypt(user_password, owner_password=owner_password)
+    report_phase('serialize')
+    with atomic_output(output_path) as f_out:
+        object_streams = level >= 2 and writer._encryption is None and not options.get('linearize')
+        with metrics_phase('serialize'):
+            if options.get('linearize'):
+                _write_linearized(writer, f_out)
+            elif object_streams:
+                _write_with_object_streams(writer, f_out)
+            else:
+                writer.write(f_out)
+        if level:
+            stats.update(output=output_path, level=level, object_streams=object_streams,
+                         input_bytes=options.get('input_bytes'), bytes_after=f_out.tell())
+            if options.get('measure_unoptimized'):
+                stats['bytes_before'] = unoptimized.size
+            options.setdefault('optimize_stats', []).append(stats)
+
+def _input_identities(input_paths):
+    """
+    One key per input under which repeated inputs compare equal: the same
+    file (device and inode) given more than once, or different files with
+    the same content. Only files sharing their size with another file are
+    hashed, so inputs without repeats are not read an extra time.
+    """
+    try:
+        stats = [os.stat(path) for path in input_paths]
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {e.filename}")
+    except OSError as e:
+        raise IOError(f"{ERR_IO}::Error reading input PDF {e.filename}: {e}")
+    sizes = collections.Counter({(st.st_dev, st.st_ino): st.st_size for st in stats}.values())
+    digests = {}
+    keys = []
+    for path, st in zip(input_paths, stats):
+        file_id = (st.st_dev, st.st_ino)
+        if sizes[st.st_size] > 1:
+            if file_id not in digests:
+                try:
+                    digests[file_id] = _file_sha256(path)
+                except OSError as e:
+                    raise IOError(f"{ERR_IO}::Error reading input PDF {path}: {e}")
+            keys.append(digests[file_id])
+        else:
+            keys.append(file_id)
+    return keys
+
+def merge_pdfs(input_paths, output_path, passwords=None, output_options=None):
     merger = PdfWriter()
     try:
         if not input_paths:
             raise ValueError(f"{ERR_INVALID_ARGUMENT}::No input files provided for merge operation.")
-        for pdf_path in input_paths:
+        # an input given more than once is parsed once; appending the same
+        # reader again adds new page dictionaries but reuses the objects
+        # already copied from it, so its content and resources are stored once
+        readers = {}
+        identities = _input_identities(input_paths)
+        for pdf_path, password, identity in track_progress(list(zip(input_paths, passwords or [None] * len(input_paths), identities)), phase='inputs'):
             try:
-                reader = PdfReader(pdf_path)
+                reader = readers.get(identity)
+                if reader is None:
+                    reader = readers[identity] = open_pdf_reader(pdf_path, password)
                 if not reader.pages:
                     raise ValueError(f"{ERR_FILE_PROCESSING}::Input PDF '{os.path.basename(pdf_path)}' has no pages or is unreadable.")
                 merger.append(reader)
             except FileNotFoundError:
                 raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {pdf_path}")
             except WrongPasswordError:
-                raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(pdf_path)}' is password protected and cannot be merged without decryption.")
+                raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(pdf_path)}' is password protected and its password (--input-passwords/--password) is missing or incorrect.")
             except PdfReadError as pre:
                 raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(pdf_path)}': {pre}")
             except Exception as e:
                 raise ValueError(f"{ERR_FILE_PROCESSING}::Error processing input PDF '{os.path.basename(pdf_path)}': {type(e).__name__} - {e}")
         if not merger.pages:
              raise ValueError(f"{ERR_FILE_PROCESSING}::No pages were added to the merge output, possibly due to empty or problematic input PDFs.")
-        with open(output_path, "wb") as f_out:
-            merger.write(f_out)
+        write_pdf(merger, output_path, output_options)
     except IOError as e:
         raise IOError(f"{ERR_IO}::Error writing merged output PDF {output_path}: {e}")
     except Exception as e:
@@ -82,24 +1029,500 @@ def merge_pdfs(input_paths, output_path):
     finally:
         merger.close()
 
-def rotate_pages_in_pdf(input_path, output_path, angle, page_spec_str=None):
+class StreamingPdfWriter:
+    """
+    Minimal PDF writer that serializes every copied object to the output as
+    soon as it is reached and only keeps its offset. Stream objects (images,
+    embedded fonts, content) with identical dictionary and data are written
+    once and shared, also across different input documents. Pages reached
+    through references (link destinations, annotation /P) are never copied
+    with their page tree: they get a number that a later add_pages() of the
+    same page takes over, or that close() writes as null, like PdfWriter
+    drops links to pages it does not write.
+    """
+    # keys owned by the page tree / structure tree of the source document
+    SKIPPED_PAGE_KEYS = ('/Parent', '/StructParents')
+    PAGE_TREE_TYPES = ('/Page', '/Pages')
+
+    def __init__(self, f_out):
+        self.f_out = f_out
+        self.offsets = {}
+        self.next_number = 3  # 1: catalog, 2: page tree root
+        self.page_numbers = []
+        self.reserved_pages = set()
+        self.stream_digests = {}
+        self.deduplicated_streams = 0
+        f_out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _allocate(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _write_serialized(self, number, data):
+        self.offsets[number] = self.f_out.tell()
+        self.f_out.write(b"%d 0 obj\n" % number + data + b"\nendobj\n")
+
+    @staticmethod
+    def _serialize(obj):
+        buf = io.BytesIO()
+        obj.write_to_stream(buf)
+        return buf.getvalue()
+
+    def add_pages(self, pages, memo=None):
+        """
+        Copies `pages` (PageObjects of one source document) to the output.
+        Passing the same `memo` to several calls for one document keeps
+        objects shared between their pages written once.
+        """
+        memo = {} if memo is None else memo
+        numbers = []
+        for page in pages:
+            key = None if page.indirect_reference is None else (page.indirect_reference.idnum, page.indirect_reference.generation)
+            number = memo.get(key)
+            if number in self.reserved_pages:
+                self.reserved_pages.remove(number)
+            else:
+                number = self._allocate()
+                if key is not None:
+                    # links keep pointing to the first copy of a repeated page
+                    memo.setdefault(key, number)
+            numbers.append(number)
+        for page, number in zip(pages, numbers):
+            copied = DictionaryObject({NameObject(k): self._copy(v, memo) for k, v in page.items()
+                                       if k not in self.SKIPPED_PAGE_KEYS})
+            copied[NameObject('/Parent')] = IndirectObject(2, 0, None)
+            self._write_serialized(number, self._serialize(copied))
+        self.page_numbers.extend(numbers)
+
+    def _copy(self, obj, memo):
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            number = memo.get(key)
+            if number == -1:
+                # reference cycle through a stream that is still being copied
+                number = memo[key] = self._allocate()
+            if number is not None:
+                return IndirectObject(number, 0, None)
+            target = obj.get_object()
+            if target is None:
+                return NullObject()
+            if isinstance(target, StreamObject):
+                memo[key] = -1
+                data = self._serialize(self._copy_direct(target, memo))
+                number = memo[key]
+                if number == -1:
+                    digest = hashlib.sha256(data).digest()
+                    number = self.stream_digests.get(digest)
+                    if number is not None:
+                        self.deduplicated_streams += 1
+                        memo[key] = number
+                        return IndirectObject(number, 0, None)
+                    number = self.stream_digests[digest] = self._allocate()
+                    memo[key] = number
+                self._write_serialized(number, data)
+                return IndirectObject(number, 0, None)
+            if isinstance(target, DictionaryObject) and target.get('/Type') in self.PAGE_TREE_TYPES:
+                if target['/Type'] == '/Pages':
+                    return NullObject()
+                number = memo[key] = self._allocate()
+                self.reserved_pages.add(number)
+                return IndirectObject(number, 0, None)
+            number = memo[key] = self._allocate()
+            self._write_serialized(number, self._serialize(self._copy_direct(target, memo)))
+            return IndirectObject(number, 0, None)
+        return self._copy_direct(obj, memo)
+
+    def _copy_direct(self, obj, memo):
+        if isinstance(obj, StreamObject):
+            copied = obj.__class__()
+            copied._data = obj._data
+            copied.update({NameObject(k): self._copy(v, memo) for k, v in obj.items() if k != '/Length'})
+            return copied
+        if isinstance(obj, DictionaryObject):
+            return DictionaryObject({NameObject(k): self._copy(v, memo) for k, v in obj.items()})
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(v, memo) for v in obj)
+        return obj
+
+    def close(self):
+        for number in self.reserved_pages:
+            # linked page that was not written
+            self._write_serialized(number, b"null")
+        kids = " ".join(f"{n} 0 R" for n in self.page_numbers)
+        self._write_serialized(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_numbers)} >>".encode('ascii'))
+        self._write_serialized(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self.f_out.tell()
+        self.f_out.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_number)
+        for number in range(1, self.next_number):
+            if number in self.offsets:
+                self.f_out.write(b"%010d 00000 n \n" % self.offsets[number])
+            else:
+                self.f_out.write(b"0000000000 65535 f \n")
+        self.f_out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_number, xref_offset))
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _rss_bytes():
+    """Current resident set size; the peak RSS where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f_statm:
+            return int(f_statm.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_bytes()
+
+def merge_pdfs_streaming(input_paths, output_path, memory_budget_bytes=None, passwords=None):
+    """
+    Bounded-memory merge: inputs are opened one at a time through a file
+    handle (pypdf then only loads the objects that are actually copied) and
+    every object is written to the output as soon as it is copied, so memory
+    follows the largest single input instead of the sum of all inputs.
+    Identical streams such as fonts and images are stored once, and an input
+    given more than once only adds page dictionaries after its first copy.
+    Outlines and named destinations are not carried over. With
+    `memory_budget_bytes` the resident set size is checked while each input
+    is open and after the output is written, failing with
+    FILE_PROCESSING_ERROR as soon as it exceeds the budget. Returns merge
+    statistics including the highest RSS seen and the peak RSS of the
+    process.
+    """
+    if not input_paths:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::No input files provided for merge operation.")
+    identities = _input_identities(input_paths)
+    # copy memos of inputs that occur again later: their next copy reuses the
+    # objects already written and only adds new page dictionaries
+    remaining = collections.Counter(identities)
+    memos = {}
+    max_rss = 0
+
+    def check_budget(after):
+        nonlocal max_rss
+        rss = _rss_bytes()
+        max_rss = max(max_rss, rss)
+        if memory_budget_bytes is not None and rss > memory_budget_bytes:
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Merge exceeded the memory budget of {memory_budget_bytes // (1024 * 1024)} MB "
+                             f"({rss // (1024 * 1024)} MB resident {after}).")
+
+    try:
+        with atomic_output(output_path) as f_out:
+            writer = StreamingPdfWriter(f_out)
+            for pdf_path, password, identity in track_progress(list(zip(input_paths, passwords or [None] * len(input_paths), identities)), phase='inputs'):
+                try:
+                    with open(pdf_path, "rb") as f_in:
+                        reader = open_pdf_reader(f_in, password)
+                        if not reader.pages:
+                            raise ValueError(f"{ERR_FILE_PROCESSING}::Input PDF '{os.path.basename(pdf_path)}' has no pages or is unreadable.")
+                        remaining[identity] -= 1
+                        memo = memos.pop(identity, {})
+                        writer.add_pages(list(reader.pages), memo)
+                        if remaining[identity]:
+                            memos[identity] = memo
+                        check_budget(f"while copying '{os.path.basename(pdf_path)}'")
+                    del reader
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {pdf_path}")
+                except WrongPasswordError:
+                    raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(pdf_path)}' is password protected and its password (--input-passwords/--password) is missing or incorrect.")
+                except PdfReadError as pre:
+                    raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(pdf_path)}': {pre}")
+                except ValueError:
+                    raise
+                except IOError:
+                    raise
+                except Exception as e:
+                    raise ValueError(f"{ERR_FILE_PROCESSING}::Error processing input PDF '{os.path.basename(pdf_path)}': {type(e).__name__} - {e}")
+            report_phase('serialize')
+            with metrics_phase('serialize'):
+                writer.close()
+            check_budget("after writing the output")
+            output_size = f_out.tell()
+    except IOError as e:
+        if isinstance(e, FileNotFoundError) and str(e).startswith(ERR_FILE_PROCESSING): raise
+        raise IOError(f"{ERR_IO}::Error writing merged output PDF {output_path}: {e}")
+    except Exception as e:
+        if isinstance(e, (ValueError, FileNotFoundError, IOError)): raise
+        raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error during merge: {type(e).__name__} - {e}")
+    metrics_count('pages', len(writer.page_numbers))
+    peak_rss = _peak_rss_bytes()
+    return {
+        'inputs': len(input_paths),
+        'pages': len(writer.page_numbers),
+        'objects': writer.next_number - 1,
+        'deduplicated_streams': writer.deduplicated_streams,
+        'repeated_inputs': len(identities) - len(set(identities)),
+        'output_bytes': output_size,
+        'rss_bytes': max_rss,
+        'peak_rss_bytes': peak_rss,
+        'memory_budget_bytes': memory_budget_bytes,
+    }
+
+LARGE_FILE_OPERATIONS = ('rotate', 'delete_pages', 'extract_pages', 'reverse_pages', 'duplicate_pages')
+# resolved objects kept by the reader before its cache is dropped in large-file mode
+LARGE_FILE_CACHE_OBJECTS = 500
+
+def release_mapped_pages(mapped):
+    """Drops the pages of a read-only mapping from the resident set; they are re-read on access."""
+    if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+        mapped.madvise(mmap.MADV_DONTNEED)
+
+@contextlib.contextmanager
+def open_mapped_pdf(path, password=None):
+    """
+    Opens `path` memory-mapped instead of reading it into memory: only the
+    parts of the file that are actually parsed are paged in. On exit the
+    reader is detached from the mapping and the mapping is closed, so a
+    long-lived --serve worker does not keep it.
+    """
+    with open(path, "rb") as f_in:
+        if os.fstat(f_in.fileno()).st_size == 0:
+            raise PdfReadError("Cannot read an empty file")
+        mapped = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+        reader = None
+        try:
+            # a lenient open checks every xref offset, touching the whole
+            # mapping; that is needed only for files with a broken xref
+            try:
+                reader = open_pdf_reader(mapped, password, strict=True)
+            except PdfReadError:
+                reader = open_pdf_reader(mapped, password)
+            reader.strict = False
+            release_mapped_pages(mapped)
+            yield reader
+        finally:
+            if reader is not None:
+                reader.resolved_objects.clear()
+                reader.stream = None
+            del reader
+            try:
+                mapped.close()
+            except BufferError:
+                # buffers exported from the mapping can still be held by
+                # garbage reference cycles (e.g. a traceback); anything
+                # else holding one is a leak and must not pass silently
+                gc.collect()
+                mapped.close()
+
+class LazyPageTree:
+    """
+    Random access to the pages of `reader` that resolves only the page tree
+    nodes on the way to the requested page, skipping whole subtrees by their
+    /Count, instead of flattening the tree like `reader.pages` does. Kids
+    arrays are kept, so dropping the reader's object cache stays cheap.
+    """
+
+    def __init__(self, reader):
+        self.root = reader.trailer['/Root'].get_object()['/Pages'].get_object()
+        self._kids = {}
+
+    def __len__(self):
+        return int(self.root['/Count'])
+
+    def _node_kids(self, node):
+        """Returns the kids of `node` and the running page counts, or None for the counts when every kid is one page."""
+        key = id(node) if node.indirect_reference is None else node.indirect_reference.idnum
+        if key not in self._kids:
+            kids = list(node['/Kids'].get_object())
+            ends = None
+            # as many pages as kids: each kid holds one page, no need to resolve them all
+            if int(node['/Count']) != len(kids):
+                counts = []
+                for kid in kids:
+                    kid = kid.get_object()
+                    counts.append(int(kid['/Count']) if '/Kids' in kid else 1)
+                ends = list(itertools.accumulate(counts))
+            self._kids[key] = (kids, ends)
+        return self._kids[key]
+
+    def page(self, index):
+        """Returns the page dictionary at 0-based `index` and its attributes, including inherited ones."""
+        node, attrs = self.root, {}
+        while True:
+            for key in INHERITABLE_PAGE_KEYS:
+                if key in node:
+                    attrs[key] = node[key]
+            if '/Kids' not in node:
+                return node, attrs
+            kids, ends = self._node_kids(node)
+            n = index if ends is None else bisect.bisect_right(ends, index)
+            if n >= len(kids):
+                raise PdfReadError(f"Page {index + 1} is missing from the page tree")
+            index = 0 if ends is None else index - (ends[n - 1] if n else 0)
+            node = kids[n].get_object()
+
+def write_pages_large_file(input_path, output_path, page_plan, password=None):
+    """
+    Large-file mode of the page operations. The input is memory-mapped and
+    `page_plan(num_pages)` lists the (page_index, rotate_by) pairs to write,
+    in output order. Only the page tree nodes and objects those pages use
+    are resolved; every page is written out as soon as it is copied and the
+    reader's object cache is dropped regularly, so memory follows the
+    selected pages instead of the document.
+    """
+    with open_mapped_pdf(input_path, password) as reader:
+        tree = LazyPageTree(reader)
+        if len(tree) == 0:
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot process pages for an empty PDF: '{os.path.basename(input_path)}'.")
+        plan = list(page_plan(len(tree)))
+        with atomic_output(output_path) as f_out:
+            writer = StreamingPdfWriter(f_out)
+            memo = {}
+            for index, rotate_by in track_progress(plan):
+                page, attrs = tree.page(index)
+                copied = DictionaryObject(page)
+                for key, value in attrs.items():
+                    if key not in copied:
+                        copied[NameObject(key)] = value
+                copied.indirect_reference = page.indirect_reference
+                if rotate_by:
+                    copied[NameObject('/Rotate')] = NumberObject(int(attrs.get('/Rotate', 0)) + rotate_by)
+                writer.add_pages([copied], memo)
+                if len(reader.resolved_objects) > LARGE_FILE_CACHE_OBJECTS:
+                    reader.resolved_objects.clear()
+                    release_mapped_pages(reader.stream)
+            metrics_count('pages', len(plan))
+            report_phase('serialize')
+            with metrics_phase('serialize'):
+                writer.close()
+
+def _startxref_offset(f_in):
+    f_in.seek(0, os.SEEK_END)
+    size = f_in.tell()
+    f_in.seek(max(0, size - 1024))
+    tail = f_in.read()
+    match = re.match(rb'startxref\s+(\d+)', tail[tail.rfind(b'startxref'):])
+    if not match:
+        raise PdfReadError("startxref not found")
+    return int(match.group(1))
+
+def write_incremental_update(reader, f_in, output_path, changed_objects):
+    """
+    Writes a copy of the original file followed by a PDF incremental update
+    holding only `changed_objects` ((IndirectObject, new_object) pairs of
+    objects of `reader`), so the cost of writing is proportional to the
+    edit. The new xref section is a classic table or an xref stream, like
+    the original's, and chains to it through /Prev. Objects of encrypted
+    files are encrypted again with the document's own key.
+    """
+    prev_xref = _startxref_offset(f_in)
+    f_in.seek(prev_xref)
+    uses_xref_stream = not f_in.read(4).startswith(b'xref')
+    f_in.seek(0, os.SEEK_END)
+    original_size = f_in.tell()
+    f_in.seek(original_size - 1)
+    ends_with_newline = f_in.read(1) in (b'\n', b'\r')
+
+    f_in.seek(0)
+    with atomic_output(output_path) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        if not ends_with_newline:
+            f_out.write(b"\n")
+        offsets = {}
+        for ref, obj in changed_objects:
+            if reader._encryption is not None:
+                obj = reader._encryption.encrypt_object(obj, ref.idnum, ref.generation)
+            buf = io.BytesIO()
+            obj.write_to_stream(buf)
+            offsets[ref.idnum] = (f_out.tell(), ref.generation)
+            f_out.write(b"%d %d obj\n" % (ref.idnum, ref.generation) + buf.getvalue() + b"\nendobj\n")
+
+        trailer = DictionaryObject()
+        for key in ('/Root', '/Info', '/Encrypt'):
+            if key in reader.trailer:
+                trailer[NameObject(key)] = reader.trailer.raw_get(key)
+        if '/ID' in reader.trailer:
+            # the first identifier is permanent, the second changes with every update
+            first_id = reader.trailer['/ID'][0].original_bytes
+            trailer[NameObject('/ID')] = ArrayObject([
+                ByteStringObject(first_id),
+                ByteStringObject(hashlib.md5(b"%s|%d|%f" % (first_id, original_size, time.time())).digest())
+            ])
+        size = max(int(reader.trailer['/Size']), max(offsets, default=0) + 1)
+        trailer[NameObject('/Prev')] = NumberObject(prev_xref)
+
+        xref_offset = f_out.tell()
+        if uses_xref_stream:
+            offsets[size] = (xref_offset, 0)
+            size += 1
+            numbers = sorted(offsets)
+            width = max(1, (xref_offset.bit_length() + 7) // 8)
+            data = b"".join(b"\x01" + offsets[n][0].to_bytes(width, 'big') + offsets[n][1].to_bytes(2, 'big')
+                            for n in numbers)
+            data = zlib.compress(data)
+            trailer.update({
+                NameObject('/Type'): NameObject('/XRef'),
+                NameObject('/Size'): NumberObject(size),
+                NameObject('/Index'): ArrayObject(NumberObject(v) for n in numbers for v in (n, 1)),
+                NameObject('/W'): ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)]),
+                NameObject('/Filter'): NameObject('/FlateDecode'),
+                NameObject('/Length'): NumberObject(len(data)),
+            })
+            buf = io.BytesIO()
+            trailer.write_to_stream(buf)
+            f_out.write(b"%d 0 obj\n" % (size - 1) + buf.getvalue() + b"\nstream\n" + data + b"\nendstream\nendobj\n")
+        else:
+            f_out.write(b"xref\n")
+            for _, run in itertools.groupby(enumerate(sorted(offsets)), lambda item: item[1] - item[0]):
+                run = [n for _, n in run]
+                f_out.write(b"%d %d\n" % (run[0], len(run)))
+                for n in run:
+                    f_out.write(b"%010d %05d n \n" % offsets[n])
+            trailer[NameObject('/Size')] = NumberObject(size)
+            buf = io.BytesIO()
+            trailer.write_to_stream(buf)
+            f_out.write(b"trailer\n" + buf.getvalue() + b"\n")
+        f_out.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+def _rotate_pages_incremental(input_path, output_path, angle, page_spec_str, password):
+    with open(input_path, "rb") as f_in:
+        reader = open_pdf_reader(f_in, password)
+        num_total_pages = pdf_page_count(reader)
+        if num_total_pages == 0:
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot process pages for an empty PDF: '{os.path.basename(input_path)}'.")
+        pages_to_rotate = parse_page_spec(page_spec_str, num_total_pages)
+        changed_objects = []
+        for i, (page, attrs) in enumerate(track_progress(iter_page_tree(reader), num_total_pages)):
+            if i not in pages_to_rotate:
+                continue
+            if page.indirect_reference is None:
+                raise ValueError(f"page {i + 1} is not an indirect object and cannot be updated incrementally")
+            updated = DictionaryObject(page)
+            # same result as PageObject.rotate() on the flattened page
+            updated[NameObject('/Rotate')] = NumberObject(int(attrs.get('/Rotate', 0)) + angle)
+            changed_objects.append((page.indirect_reference, updated))
+        metrics_count('pages', len(changed_objects))
+        report_phase('serialize')
+        with metrics_phase('serialize'):
+            write_incremental_update(reader, f_in, output_path, changed_objects)
+
+def rotate_pages_in_pdf(input_path, output_path, angle, page_spec_str=None, password=None, output_options=None,
+                        incremental=False, large_file=False):
     writer = PdfWriter()
     try:
-        reader = PdfReader(input_path)
+        if incremental:
+            _rotate_pages_incremental(input_path, output_path, angle, page_spec_str, password)
+            return
+        if large_file:
+            def page_plan(num_total_pages):
+                pages_to_rotate = parse_page_spec(page_spec_str, num_total_pages)
+                return [(i, angle if i in pages_to_rotate else 0) for i in range(num_total_pages)]
+            write_pages_large_file(input_path, output_path, page_plan, password)
+            return
+        reader = open_pdf_reader(input_path, password)
         num_total_pages = len(reader.pages)
         if num_total_pages == 0:
              raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot process pages for an empty PDF: '{os.path.basename(input_path)}'.")
         pages_to_rotate = parse_page_spec(page_spec_str, num_total_pages)
-        for i, page in enumerate(reader.pages):
+        for i, page in enumerate(track_progress(reader.pages)):
             if i in pages_to_rotate:
                 page.rotate(angle)
             writer.add_page(page)
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, output_options)
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except WrongPasswordError:
-        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected. Please decrypt it first.")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected and the password (--password) is missing or incorrect.")
     except PdfReadError as pre:
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
     except IOError as e:
@@ -112,25 +1535,33 @@ def rotate_pages_in_pdf(input_path, output_path, angle, page_spec_str=None):
     finally:
         writer.close()
 
-def delete_pages_from_pdf(input_path, output_path, page_spec_str_to_delete):
+def delete_pages_from_pdf(input_path, output_path, page_spec_str_to_delete, password=None, output_options=None,
+                          large_file=False):
     writer = PdfWriter()
     try:
-        reader = PdfReader(input_path)
+        if large_file:
+            def page_plan(num_total_pages):
+                pages_to_delete_0_indexed = parse_page_spec(page_spec_str_to_delete, num_total_pages)
+                if len(pages_to_delete_0_indexed) == num_total_pages:
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Deleting all pages specified. Resulting PDF would be empty. Operation aborted for '{os.path.basename(input_path)}'.")
+                return [(i, 0) for i in range(num_total_pages) if i not in pages_to_delete_0_indexed]
+            write_pages_large_file(input_path, output_path, page_plan, password)
+            return
+        reader = open_pdf_reader(input_path, password)
         num_total_pages = len(reader.pages)
         if num_total_pages == 0:
              raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot delete pages from an empty PDF: '{os.path.basename(input_path)}'.")
         pages_to_delete_0_indexed = parse_page_spec(page_spec_str_to_delete, num_total_pages)
         if len(pages_to_delete_0_indexed) == num_total_pages:
             raise ValueError(f"{ERR_INVALID_ARGUMENT}::Deleting all pages specified. Resulting PDF would be empty. Operation aborted for '{os.path.basename(input_path)}'.")
-        for i, page in enumerate(reader.pages):
+        for i, page in enumerate(track_progress(reader.pages)):
             if i not in pages_to_delete_0_indexed:
                 writer.add_page(page)
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, output_options)
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except WrongPasswordError:
-        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected. Please decrypt it first.")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected and the password (--password) is missing or incorrect.")
     except PdfReadError as pre:
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
     except IOError as e:
@@ -143,24 +1574,32 @@ def delete_pages_from_pdf(input_path, output_path, page_spec_str_to_delete):
     finally:
         writer.close()
 
-def extract_specific_pages(input_path, output_path, page_spec_str_to_extract):
+def extract_specific_pages(input_path, output_path, page_spec_str_to_extract, password=None, output_options=None,
+                           large_file=False):
     writer = PdfWriter()
     try:
-        reader = PdfReader(input_path)
+        if large_file:
+            def page_plan(num_total_pages):
+                pages_to_extract_0_indexed = parse_page_spec(page_spec_str_to_extract, num_total_pages)
+                if not pages_to_extract_0_indexed:
+                    raise ValueError(f"{ERR_PAGE_RANGE}::Page specification for extraction resulted in no pages selected for '{os.path.basename(input_path)}'.")
+                return [(i, 0) for i in pages_to_extract_0_indexed]
+            write_pages_large_file(input_path, output_path, page_plan, password)
+            return
+        reader = open_pdf_reader(input_path, password)
         num_total_pages = len(reader.pages)
         if num_total_pages == 0:
              raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot extract pages from an empty PDF: '{os.path.basename(input_path)}'.")
         pages_to_extract_0_indexed = parse_page_spec(page_spec_str_to_extract, num_total_pages)
         if not pages_to_extract_0_indexed :
             raise ValueError(f"{ERR_PAGE_RANGE}::Page specification for extraction resulted in no pages selected for '{os.path.basename(input_path)}'.")
-        for i in pages_to_extract_0_indexed:
+        for i in track_progress(pages_to_extract_0_indexed):
             writer.add_page(reader.pages[i])
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, output_options)
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except WrongPasswordError:
-        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected. Please decrypt it first.")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected and the password (--password) is missing or incorrect.")
     except PdfReadError as pre:
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
     except IOError as e:
@@ -173,19 +1612,163 @@ def extract_specific_pages(input_path, output_path, page_spec_str_to_extract):
     finally:
         writer.close()
 
-def encrypt_pdf_file(input_path, output_path, user_password, owner_password=None):
+def format_page_ranges(pages):
+    """Compact 1-indexed spec ('1-3,7') for ascending 0-indexed pages."""
+    parts = []
+    for _, run in itertools.groupby(enumerate(pages), key=lambda item: item[1] - item[0]):
+        run = [page for _, page in run]
+        parts.append(f"{run[0]+1}-{run[-1]+1}" if len(run) > 1 else f"{run[0]+1}")
+    return ",".join(parts)
+
+def _direct_size(obj, references):
+    """
+    Rough serialized size of `obj` without the indirect objects it refers
+    to; those references are appended to `references`.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            references.append(obj)
+            continue
+        if isinstance(obj, StreamObject):
+            size += len(obj._data)
+        if isinstance(obj, DictionaryObject):
+            size += 16 * len(obj)
+            stack.extend(v for k, v in obj.items() if k not in ('/Parent', '/P'))
+        elif isinstance(obj, ArrayObject):
+            size += 8 * len(obj)
+            stack.extend(obj)
+    return size
+
+def _page_size_estimate(page, memo):
+    """
+    Rough serialized size of a page: (size of the page dictionary, {key:
+    size} of every indirect object it references). `memo` keeps the size
+    and references of each object, so objects shared between pages (fonts,
+    images) are only read once per split.
+    """
+    references = []
+    own_size = _direct_size(page, references)
+    objects = {}
+    while references:
+        ref = references.pop()
+        key = (ref.idnum, ref.generation)
+        if key in objects:
+            continue
+        if key not in memo:
+            children = []
+            memo[key] = (40 + _direct_size(ref.get_object(), children), children)  # 40: "n 0 obj ... endobj" and its xref entry
+        objects[key] = memo[key][0]
+        references.extend(memo[key][1])
+    return own_size, objects
+
+def _split_groups_by_size(reader, max_bytes):
+    # shared objects count once per output part
+    groups, current, current_size, seen, memo = [], [], 0, set(), {}
+    for i, page in enumerate(reader.pages):
+        own_size, objects = _page_size_estimate(page, memo)
+        page_size = own_size + sum(size for key, size in objects.items() if key not in seen)
+        if current and current_size + page_size > max_bytes:
+            groups.append(current)
+            current, current_size, seen = [], 0, set()
+            page_size = own_size + sum(objects.values())
+        seen.update(objects)
+        current.append(i)
+        current_size += page_size
+    if current:
+        groups.append(current)
+    return groups
+
+def _write_split_part(writer, path, output_options=None):
+    try:
+        write_pdf(writer, path, output_options)
+        return os.path.getsize(path)
+    finally:
+        writer.close()
+
+def split_pdf(input_path, output_dir, chunk_size=None, page_specs=None, max_bytes=None, workers=1, password=None, output_options=None):
+    """
+    Splits one PDF into several files from a single parse. Exactly one of
+    `chunk_size` (pages per part), `page_specs` (list of page specifications,
+    one per part) or `max_bytes` (estimated size per part) selects how. Parts
+    are written to `output_dir` as <name>_partNNN.pdf, up to `workers` at a
+    time. Returns the manifest describing the written parts.
+    """
+    try:
+        if sum(option is not None for option in (chunk_size, page_specs, max_bytes)) != 1:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Split requires exactly one of --chunk-size, --split-pages or --max-bytes.")
+        if (chunk_size is not None and chunk_size < 1) or (max_bytes is not None and max_bytes < 1):
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::--chunk-size and --max-bytes must be 1 or greater.")
+        if os.path.exists(output_dir) and not os.path.isdir(output_dir):
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Split output must be a directory: {output_dir}")
+        reader = open_pdf_reader(input_path, password)
+        num_total_pages = len(reader.pages)
+        if num_total_pages == 0:
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot split an empty PDF: '{os.path.basename(input_path)}'.")
+        if page_specs is not None:
+            if not page_specs:
+                raise ValueError(f"{ERR_INVALID_ARGUMENT}::--split-pages needs at least one page specification.")
+            groups = [parse_page_spec(spec, num_total_pages) for spec in page_specs]
+        elif chunk_size is not None:
+            groups = [range(start, min(start + chunk_size, num_total_pages)) for start in range(0, num_total_pages, chunk_size)]
+        else:
+            groups = _split_groups_by_size(reader, max_bytes)
+
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        width = max(3, len(str(len(groups))))
+        parts = []
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                in_flight = collections.deque()
+                for n, group in enumerate(track_progress(groups, phase='parts'), 1):
+                    writer = PdfWriter()
+                    for i in group:
+                        writer.add_page(reader.pages[i])
+                    path = os.path.join(output_dir, f"{stem}_part{n:0{width}d}.pdf")
+                    parts.append({'path': path, 'pages': format_page_ranges(group), 'page_count': len(group)})
+                    in_flight.append((parts[-1], executor.submit(_write_split_part, writer, path, output_options)))
+                    # written parts release their pages; keep only a few finished writers waiting
+                    while len(in_flight) > max(1, workers):
+                        part, future = in_flight.popleft()
+                        part['bytes'] = future.result()
+                for part, future in in_flight:
+                    part['bytes'] = future.result()
+        except BaseException:
+            # a failed split leaves no parts behind, like the other operations leave no output
+            for part in parts:
+                with contextlib.suppress(OSError):
+                    os.unlink(part['path'])
+            raise
+        return {'input': os.path.basename(input_path), 'page_count': num_total_pages, 'parts': parts}
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
+    except WrongPasswordError:
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected and the password (--password) is missing or incorrect.")
+    except PdfReadError as pre:
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
+    except IOError as e:
+        raise IOError(f"{ERR_IO}::Error writing split parts to {output_dir}: {e}")
+    except ValueError as ve:
+        if str(ve).startswith((ERR_PAGE_RANGE, ERR_INVALID_ARGUMENT, ERR_FILE_PROCESSING)): raise
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error while splitting '{os.path.basename(input_path)}': {ve}")
+    except Exception as e:
+        raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error splitting '{os.path.basename(input_path)}': {type(e).__name__} - {e}")
+
+def encrypt_pdf_file(input_path, output_path, user_password, owner_password=None, output_options=None):
     writer = PdfWriter()
     try:
-        reader = PdfReader(input_path)
+        with metrics_phase('open'):
+            reader = PdfReader(input_path)
         if reader.is_encrypted:
              raise ValueError(f"{ERR_FILE_PROCESSING}::Input PDF '{os.path.basename(input_path)}' is already encrypted. Decrypt it first if you want to re-encrypt with different settings.")
         if not reader.pages:
             raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot encrypt an empty PDF: '{os.path.basename(input_path)}'.")
-        for page in reader.pages:
+        for page in track_progress(reader.pages):
             writer.add_page(page)
-        writer.encrypt(user_password, owner_password=owner_password)
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, dict(output_options or {}, encrypt=(user_password, owner_password)))
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except WrongPasswordError:
@@ -200,12 +1783,13 @@ def encrypt_pdf_file(input_path, output_path, user_password, owner_password=None
     finally:
         writer.close()
 
-def decrypt_pdf_file(input_path, output_path, password):
+def decrypt_pdf_file(input_path, output_path, password, output_options=None):
     writer = PdfWriter()
     reader = None
     try:
         try:
-            reader = PdfReader(input_path, password=password)
+            with metrics_phase('open'):
+                reader = PdfReader(input_path, password=password)
         except WrongPasswordError:
             raise ValueError(f"{ERR_DECRYPTION_FAILED}::Incorrect password provided for PDF '{os.path.basename(input_path)}'.")
         except PdfReadError as e:
@@ -222,10 +1806,9 @@ def decrypt_pdf_file(input_path, output_path, password):
                 raise ValueError(f"{ERR_DECRYPTION_FAILED}::Password was not accepted for decryption by the decrypt() method for PDF '{os.path.basename(input_path)}'.")
         if not reader.pages and os.path.getsize(input_path) > 1024 :
              raise ValueError(f"{ERR_FILE_PROCESSING}::PDF '{os.path.basename(input_path)}' became empty after password attempt, possibly corrupted.")
-        for page in reader.pages:
+        for page in track_progress(reader.pages):
             writer.add_page(page)
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, output_options)
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except IOError as e:
@@ -242,150 +1825,709 @@ def decrypt_pdf_file(input_path, output_path, password):
         if writer:
             writer.close()
 
-IMAGE_EXTS = {'.png', '.jpg', '.jpeg'}
-def _make_pdf_reader(path: str) -> PdfReader:
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# random key of a cache directory that password digests in result cache keys are made with
+CACHE_SECRET_NAME = 'secret.key'
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f_in:
+        for chunk in iter(lambda: f_in.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_path(cache_dir, key, suffix):
+    return os.path.join(cache_dir, key[:2], key + suffix)
+
+def cache_lookup(cache_dir, key, suffix):
+    """Returns the cached file for `key` (marking it recently used) or None."""
+    path = _cache_path(cache_dir, key, suffix)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+def cache_store(cache_dir, key, suffix, data, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """
+    Atomically stores `data` under `key`, then evicts least recently used
+    entries until the cache is within `max_bytes`. Cache failures are never
+    fatal: the caller just does not get a cached copy next time.
+    """
+    path = _cache_path(cache_dir, key, suffix)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, "wb") as f_tmp:
+            f_tmp.write(data)
+        os.replace(tmp_path, path)
+        _cache_evict(cache_dir, max_bytes)
+    except OSError:
+        return None
+    return path
+
+def cache_store_file(cache_dir, key, suffix, src_path, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """Like cache_store, but copies an existing file instead of writing bytes."""
+    path = _cache_path(cache_dir, key, suffix)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        _cache_evict(cache_dir, max_bytes)
+    except OSError:
+        return None
+    return path
+
+def _cache_evict(cache_dir, max_bytes):
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith('.tmp') or (root == cache_dir and name == CACHE_SECRET_NAME):
+                continue
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+
+# overlays are told apart by content, not by name: streamed overlays
+# ('-', fd:N) are spooled to a path without a suffix
+IMAGE_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff")
+
+def is_image_file(path):
+    """True if `path` starts with a PNG or JPEG signature."""
+    with open(path, "rb") as f_in:
+        head = f_in.read(8)
+    return head.startswith(IMAGE_SIGNATURES)
+
+JPEG_COLORSPACES = {'L': '/DeviceGray', 'RGB': '/DeviceRGB', 'CMYK': '/DeviceCMYK'}
+
+def _jpeg_pdf_bytes(jpeg_data, img):
     """
-    If `path` is an image, convert it in-memory to a 1-page PDF
-    (Pillow auto-embeds any alpha mask). Otherwise, read the PDF.
+    One-page PDF embedding the JPEG stream as-is (/DCTDecode), so the image is
+    neither decoded nor re-encoded. 1 pixel = 1 point, like Pillow's PDF export.
     """
-    ext = os.path.splitext(path)[1].lower()
-    if ext in IMAGE_EXTS:
-        img = Image.open(path)
+    width, height = img.size
+    decode = " /Decode [1 0 1 0 1 0 1 0]" if img.mode == 'CMYK' and 'adobe' in img.info else ""
+    content = f"q {width} 0 0 {height} 0 0 cm /Im0 Do Q".encode('ascii')
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+         f"/Resources << /XObject << /Im0 5 0 R >> >> /Contents 4 0 R >>").encode('ascii'),
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace {JPEG_COLORSPACES[img.mode]} "
+         f"/BitsPerComponent 8 /Filter /DCTDecode{decode} /Length {len(jpeg_data)} >>\nstream\n").encode('ascii')
+        + jpeg_data + b"\nendstream",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return out.getvalue()
+
+def _image_pdf_bytes(path, max_pixels=None):
+    """
+    Converts an image to a one-page PDF whose page size is the image size in
+    pixels (as points). JPEGs are passed through untouched unless they have
+    to be downsampled to fit `max_pixels` (width, height); downsampled images
+    keep their page size, only the embedded resolution drops.
+    """
+    img = Image.open(path)
+    width, height = img.size
+    if max_pixels and (width > max_pixels[0] or height > max_pixels[1]):
+        ratio = min(max_pixels[0] / width, max_pixels[1] / height)
+        resized = img.resize((max(1, round(width * ratio)), max(1, round(height * ratio))), Image.LANCZOS)
         buf = io.BytesIO()
-        img.save(buf, format="PDF")
-        buf.seek(0)
-        return PdfReader(buf)
+        # keep the page size of the original image: 72 dpi * (new pixels / old pixels)
+        resized.save(buf, format="PDF", resolution=72.0 * resized.width / width)
+        return buf.getvalue()
+    if img.format == 'JPEG' and img.mode in JPEG_COLORSPACES:
+        with open(path, "rb") as f_img:
+            return _jpeg_pdf_bytes(f_img.read(), img)
+    buf = io.BytesIO()
+    img.save(buf, format="PDF")
+    return buf.getvalue()
+
+def _make_pdf_reader(path: str, cache_dir: str = None, max_pixels=None,
+                     cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES) -> PdfReader:
+    """
+    If `path` is an image, convert it to a 1-page PDF (Pillow auto-embeds any
+    alpha mask, JPEGs are embedded as-is). With a `cache_dir`, converted images
+    are kept on disk keyed by the image content hash and target size, so a
+    logo reused across jobs is converted only once. Otherwise, read the PDF.
+    """
+    if not is_image_file(path):
+        return open_pdf_reader(path)
+    if not cache_dir:
+        return PdfReader(io.BytesIO(_image_pdf_bytes(path, max_pixels)))
+    key = hashlib.sha256(f"image-pdf-v1|{_file_sha256(path)}|{max_pixels}".encode()).hexdigest()
+    cached = cache_lookup(cache_dir, key, '.pdf')
+    if cached:
+        with open(cached, "rb") as f_cached:
+            return PdfReader(io.BytesIO(f_cached.read()))
+    data = _image_pdf_bytes(path, max_pixels)
+    cache_store(cache_dir, key, '.pdf', data, cache_max_bytes)
+    return PdfReader(io.BytesIO(data))
+
+def _overlay_max_pixels(overlay_path, target_dpi, main_pages, target_pages, position='center', scale=1.0):
+    """
+    Largest pixel size worth embedding for an image overlay drawn at
+    `target_dpi`, given how big it ends up on the target pages; None for PDF
+    overlays or when no DPI target is set.
+    """
+    if not target_dpi or not is_image_file(overlay_path):
+        return None
+    with Image.open(overlay_path) as img:
+        size = img.size
+    if position == 'fit':
+        placed_scale = max(_overlay_scale(main_pages[i], size, position, scale) for i in target_pages)
     else:
-        return PdfReader(path)
+        placed_scale = scale
+    return (math.ceil(size[0] * placed_scale / 72 * target_dpi),
+            math.ceil(size[1] * placed_scale / 72 * target_dpi))
+
+OVERLAY_POSITIONS = ['center', 'fit', 'tile', 'top-left', 'top-right', 'bottom-left', 'bottom-right']
+
+def _pdf_number(value):
+    return f"{float(value):.4f}".rstrip('0').rstrip('.') or '0'
+
+def _overlay_scale(page, overlay_size, position, scale):
+    if position != 'fit':
+        return scale
+    mlx, mly = page.mediabox.lower_left
+    mux, muy = page.mediabox.upper_right
+    return scale * min(float(mux - mlx) / overlay_size[0], float(muy - mly) / overlay_size[1])
+
+class OverlayForm:
+    """
+    An overlay page converted once into a Form XObject stored in `writer`.
+    `apply` puts it *under* a page's content by prepending a tiny
+    "q <matrix> cm /Name Do Q" stream and a resource entry: the page's own
+    content streams are left untouched and the overlay content is written
+    only once, however many pages use it. Pages of the same size share the
+    same prefix stream.
+    """
+    def __init__(self, writer, overlay_page, position='center', scale=1.0):
+        if position not in OVERLAY_POSITIONS:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Unknown overlay position '{position}'. Use one of: {', '.join(OVERLAY_POSITIONS)}.")
+        if not scale or scale <= 0:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Overlay scale must be greater than 0.")
+        self.writer = writer
+        self.position = position
+        self.scale = float(scale)
+        olx, oly = overlay_page.mediabox.lower_left
+        oux, ouy = overlay_page.mediabox.upper_right
+        self.origin = (float(olx), float(oly))
+        self.size = (float(oux - olx), float(ouy - oly))
+        if self.size[0] <= 0 or self.size[1] <= 0:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Overlay page has an empty media box.")
+
+        contents = overlay_page.get_contents()
+        form = DecodedStreamObject()
+        form.set_data(contents.get_data() if contents is not None else b"")
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject([FloatObject(v) for v in (olx, oly, oux, ouy)]),
+        })
+        resources = overlay_page.get('/Resources')
+        if resources is not None:
+            form[NameObject('/Resources')] = resources.get_object().clone(writer)
+        self.ref = writer._add_object(form.flate_encode())
+        self._prefixes = {}
+        self._resources = {}
+
+    def placement(self, page):
+        """Transformation matrices drawing the overlay on `page` (several for 'tile')."""
+        mlx, mly = (float(v) for v in page.mediabox.lower_left)
+        mux, muy = (float(v) for v in page.mediabox.upper_right)
+        main_w, main_h = mux - mlx, muy - mly
+        ol_w, ol_h = self.size
+        s = _overlay_scale(page, self.size, self.position, self.scale)
+        w, h = ol_w * s, ol_h * s
+        if self.position == 'tile':
+            origins = [(mlx + col * w, mly + row * h)
+                       for row in range(math.ceil(main_h / h))
+                       for col in range(math.ceil(main_w / w))]
+        else:
+            x = {'left': mlx, 'right': mux - w}.get(self.position.partition('-')[2], mlx + (main_w - w) / 2)
+            y = {'top': muy - h, 'bottom': mly}.get(self.position.partition('-')[0], mly + (main_h - h) / 2)
+            origins = [(x, y)]
+        return [(s, 0, 0, s, x - s * self.origin[0], y - s * self.origin[1]) for x, y in origins]
+
+    def _with_overlay(self, resources):
+        """Copy of the resource dictionary `resources` with the overlay added; returns (copy, name)."""
+        resources = DictionaryObject(resources.get_object() if resources is not None else {})
+        xobjects = resources.get('/XObject')
+        xobjects = DictionaryObject(xobjects.get_object() if xobjects is not None else {})
+        name, n = NameObject('/PdfOverlay0'), 0
+        while name in xobjects and xobjects[name] != self.ref:
+            n += 1
+            name = NameObject(f'/PdfOverlay{n}')
+        xobjects[name] = self.ref
+        resources[NameObject('/XObject')] = xobjects
+        return resources, name
+
+    def apply(self, page):
+        source = page.raw_get('/Resources') if '/Resources' in page else None
+        if isinstance(source, IndirectObject):
+            # pages sharing one resource dictionary share its copy too
+            key = (id(source.pdf), source.idnum, source.generation)
+            if key not in self._resources:
+                resources, name = self._with_overlay(source)
+                self._resources[key] = (self.writer._add_object(resources), name)
+            resources, name = self._resources[key]
+        else:
+            resources, name = self._with_overlay(source)
+        page[NameObject('/Resources')] = resources
+
+        draw = "".join(f"q {' '.join(_pdf_number(v) for v in cm)} cm {name} Do Q\n" for cm in self.placement(page))
+        prefix = self._prefixes.get(draw)
+        if prefix is None:
+            stream = DecodedStreamObject()
+            stream.set_data(draw.encode('ascii'))
+            prefix = self._prefixes[draw] = self.writer._add_object(stream)
+        contents = page.get('/Contents')
+        if contents is None:
+            page[NameObject('/Contents')] = ArrayObject([prefix])
+        elif isinstance(contents.get_object(), ArrayObject):
+            page[NameObject('/Contents')] = ArrayObject([prefix, *contents.get_object()])
+        else:
+            page[NameObject('/Contents')] = ArrayObject([prefix, contents])
+        return page
 
 def overlay_pdf_pages(
     main_pdf_path: str,
     overlay_path: str,
     output_path: str,
     overlay_page_number: int = 1,
-    target_pages_spec: str = None
+    target_pages_spec: str = None,
+    position: str = 'center',
+    scale: float = 1.0,
+    target_dpi: float = None,
+    cache_dir: str = None,
+    cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+    password: str = None,
+    output_options: dict = None
 ):
     writer = PdfWriter()
     try:
-        main_reader    = PdfReader(main_pdf_path)
-        overlay_reader = _make_pdf_reader(overlay_path)
+        main_reader    = open_pdf_reader(main_pdf_path, password)
 
         # --- Validation ---
         if not main_reader.pages:
-            raise ValueError(f"Main PDF '{os.path.basename(main_pdf_path)}' has no pages.")
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Main PDF '{os.path.basename(main_pdf_path)}' has no pages.")
+        total_pages  = len(main_reader.pages)
+        pages_to_do  = parse_page_spec(target_pages_spec, total_pages)
+        max_pixels = _overlay_max_pixels(overlay_path, target_dpi, main_reader.pages, pages_to_do, position, scale)
+        try:
+            overlay_reader = _make_pdf_reader(overlay_path, cache_dir, max_pixels, cache_max_bytes)
+        except WrongPasswordError as wpe:
+            raise ValueError(f"{ERR_DECRYPTION_FAILED}::Overlay PDF '{os.path.basename(overlay_path)}' is password protected and cannot be used as an overlay: {wpe}")
         if not overlay_reader.pages:
-            raise ValueError(f"Overlay '{os.path.basename(overlay_path)}' has no pages.")
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Overlay '{os.path.basename(overlay_path)}' has no pages.")
 
         idx = overlay_page_number - 1
         if not (0 <= idx < len(overlay_reader.pages)):
             raise ValueError(
-                f"Overlay page {overlay_page_number} out of range (1–{len(overlay_reader.pages)})."
+                f"{ERR_INVALID_ARGUMENT}::Overlay page {overlay_page_number} out of range (1–{len(overlay_reader.pages)})."
             )
 
-        overlay_page = overlay_reader.pages[idx]
-        total_pages  = len(main_reader.pages)
-        pages_to_do  = parse_page_spec(target_pages_spec, total_pages)
+        overlay_form = OverlayForm(writer, overlay_reader.pages[idx], position, scale)
 
-        # --- Build each page ---
-        for i, main_page in enumerate(main_reader.pages):
+        # --- Copy every page, referencing the shared overlay from the targeted ones ---
+        for i, main_page in enumerate(track_progress(main_reader.pages)):
+            page = writer.add_page(main_page)
             if i in pages_to_do:
-                # 1) measure main page
-                mlx, mly = main_page.mediabox.lower_left
-                mux, muy = main_page.mediabox.upper_right
-                main_w, main_h = mux - mlx, muy - mly
-
-                # 2) measure overlay
-                olx, oly = overlay_page.mediabox.lower_left
-                oux, ouy = overlay_page.mediabox.upper_right
-                ol_w, ol_h = oux - olx, ouy - oly
-
-                # 3) create a blank “canvas” the size of the main page
-                bg = writer.add_blank_page(width=main_w, height=main_h)
-
-                # 4) draw overlay (centered)
-                tx = (main_w - ol_w) / 2
-                ty = (main_h - ol_h) / 2
-                bg.merge_translated_page(overlay_page, tx, ty)
-
-                # 5) draw main page content *on top*
-                bg.merge_page(main_page)
-
-                # (bg is already in writer.pages)
-            else:
-                # pages that aren’t targeted just get copied straight over
-                writer.add_page(main_page)
+                overlay_form.apply(page)
 
         # --- Write out ---
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, output_options)
 
     except FileNotFoundError as fnf:
         missing = main_pdf_path if not os.path.exists(main_pdf_path) else overlay_path
-        raise FileNotFoundError(f"Input not found: {missing}") from fnf
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input not found: {missing}") from fnf
 
     except WrongPasswordError as wpe:
-        raise ValueError(f"Encrypted PDF—decrypt first: {wpe}")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Main PDF '{os.path.basename(main_pdf_path)}' is password protected and the password (--password) is missing or incorrect: {wpe}")
 
     except PdfReadError as pre:
-        raise ValueError(f"PDF read error: {pre}")
+        raise ValueError(f"{ERR_FILE_PROCESSING}::PDF read error: {pre}")
 
     except IOError as ioe:
-        raise IOError(f"Write error: {ioe}")
+        raise IOError(f"{ERR_IO}::Write error: {ioe}")
 
     finally:
         writer.close()
 
-def extract_text_from_pdf(pdf_path, page_spec_str=None, output_text_path=None):
-    all_text_parts = []
+TEXT_FORMATS = ['text', 'ndjson', 'json']
+TEXT_CHUNK_PAGES = 32
+
+def _extract_page_text(page):
     try:
-        reader = PdfReader(pdf_path)
+        return page.extract_text(), None
+    except Exception as page_ex:
+        return None, str(page_ex)
+
+# the reader of a text extraction worker process, opened once by _init_text_worker
+_text_reader = None
+
+def _init_text_worker(pdf_path, password=None):
+    global _text_reader
+    _text_reader = open_pdf_reader(pdf_path, password)
+
+def _extract_text_chunk(page_indices):
+    # runs in a worker process, reusing the reader its initializer opened
+    return [(i, *_extract_page_text(_text_reader.pages[i])) for i in page_indices]
+
+def iter_page_texts(pdf_path, reader, pages, workers=1, password=None):
+    """
+    Yields (page_index, text, error) for each selected page, in page order.
+    With workers > 1 the pages are split into chunks extracted by worker
+    processes; only a few chunks are in flight at a time so results can be
+    streamed out as soon as the next one in order is ready. Inside a
+    --serve worker (a daemonic process, which may not have children) the
+    pages are extracted in-process.
+    """
+    if (workers <= 1 or len(pages) <= TEXT_CHUNK_PAGES or not isinstance(pdf_path, str)
+            or multiprocessing.current_process().daemon):
+        for i in pages:
+            yield (i, *_extract_page_text(reader.pages[i]))
+        return
+    page_iter = iter(pages)
+    chunks = iter(lambda: list(itertools.islice(page_iter, TEXT_CHUNK_PAGES)), [])
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_text_worker,
+                                                initargs=(pdf_path, password)) as executor:
+        in_flight = collections.deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_extract_text_chunk, chunk))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+def _write_page_texts(f_text, page_texts, text_format):
+    """
+    Streams extracted pages to `f_text` and returns how many were written.
+    'text' keeps the classic "--- Page N ---" blocks (pages without text are
+    skipped); 'ndjson' and 'json' emit one record per page with its 1-indexed
+    number, text, error and character offsets of the text within the
+    concatenation of all page texts.
+    """
+    written = 0
+    offset = 0
+    if text_format == 'json':
+        f_text.write('{"pages": [')
+    for i, text, error in page_texts:
+        if text_format == 'text':
+            if error is not None:
+                block = f"--- Page {i+1} ---\n[Error extracting text from this page: {error}]"
+            elif text and text.strip():
+                block = f"--- Page {i+1} ---\n{text.strip()}"
+            else:
+                continue
+            f_text.write(("\n\n" if written else "") + block)
+        else:
+            text = text or ""
+            record = json.dumps({'page': i + 1, 'text': text, 'char_start': offset,
+                                 'char_end': offset + len(text), 'error': error}, ensure_ascii=False)
+            offset += len(text)
+            if text_format == 'json':
+                f_text.write(("," if written else "") + "\n" + record)
+            else:
+                f_text.write(record + "\n")
+        written += 1
+    if text_format == 'json':
+        f_text.write("\n]}\n")
+    return written
+
+def extract_text_from_pdf(pdf_path, page_spec_str=None, output_text_path=None, text_format='text', workers=1, password=None):
+    try:
+        if text_format not in TEXT_FORMATS:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Unknown text format '{text_format}'. Use one of: {', '.join(TEXT_FORMATS)}.")
+        reader = open_pdf_reader(pdf_path, password)
         num_total_pages = len(reader.pages)
         if num_total_pages == 0:
-            with open(output_text_path, "w", encoding="utf-8") as f_text:
-                f_text.write("[PDF is empty - No text extracted]")
+            with atomic_output(output_text_path, "w", encoding="utf-8") as f_text:
+                if text_format == 'text':
+                    f_text.write("[PDF is empty - No text extracted]")
+                else:
+                    _write_page_texts(f_text, [], text_format)
             return output_text_path
         pages_to_extract_from = parse_page_spec(page_spec_str, num_total_pages)
-        for i in pages_to_extract_from:
-            try:
-                page_text = reader.pages[i].extract_text()
-                if page_text and page_text.strip():
-                    all_text_parts.append(f"--- Page {i+1} ---\n{page_text.strip()}\n\n")
-            except Exception as page_ex:
-                all_text_parts.append(f"--- Page {i+1} ---\n[Error extracting text from this page: {page_ex}]\n\n")
-        extracted_content = "".join(all_text_parts).strip()
-        with open(output_text_path, "w", encoding="utf-8") as f_text:
-            f_text.write(extracted_content if extracted_content else "[No text extracted from selected pages or PDF is image-based/password protected without password]")
+        metrics_count('pages', len(pages_to_extract_from))
+        with atomic_output(output_text_path, "w", encoding="utf-8") as f_text:
+            page_texts = iter_page_texts(pdf_path, reader, pages_to_extract_from, workers, password)
+            written = _write_page_texts(f_text, track_progress(page_texts, len(pages_to_extract_from)), text_format)
+            if not written and text_format == 'text':
+                f_text.write("[No text extracted from selected pages or PDF is image-based/password protected without password]")
         return output_text_path
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {pdf_path}")
     except WrongPasswordError as wpe:
-        with open(output_text_path, "w", encoding="utf-8") as f_text: # Still create output file with error
+        with atomic_output(output_text_path, "w", encoding="utf-8") as f_text: # Still create output file with error
             f_text.write(f"[Cannot extract text: PDF '{os.path.basename(pdf_path)}' is password protected. Password needed.]")
-        raise ValueError(f"{ERR_DECRYPTION_FAILED}::PDF '{os.path.basename(pdf_path)}' for text extraction is password protected. {wpe}")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::PDF '{os.path.basename(pdf_path)}' for text extraction is password protected and the password (--password) is missing or incorrect. {wpe}")
     except PdfReadError as pre:
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF for text extraction: {pre}")
     except IOError as e:
         raise IOError(f"{ERR_IO}::Error writing extracted text to {output_text_path}: {e}")
     except ValueError as ve:
-        if str(ve).startswith(ERR_PAGE_RANGE): raise
+        if str(ve).startswith((ERR_PAGE_RANGE, ERR_INVALID_ARGUMENT)): raise
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error during text extraction from '{os.path.basename(pdf_path)}': {ve}")
     except Exception as e:
         raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error extracting text from '{os.path.basename(pdf_path)}': {type(e).__name__} - {e}")
 
-def reverse_pdf_pages(input_path, output_path):
+TEXT_INDEX_FORMAT = 'pdf-text-index'
+TEXT_INDEX_VERSION = 1
+SEARCH_SNIPPETS_PER_PAGE = 3
+SEARCH_SNIPPET_CONTEXT = 60
+_TOKEN_RE = re.compile(r"\w+")
+
+def _normalize_token(token):
+    # case- and accent-insensitive: "Žltý" and "zlty" are the same term
+    decomposed = unicodedata.normalize('NFKD', token)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def text_tokens(text):
+    """Returns (normalized_token, char_start, char_end) for every word of `text`."""
+    return [(_normalize_token(m.group()), m.start(), m.end()) for m in _TOKEN_RE.finditer(text or "")]
+
+def _source_fingerprint(pdf_path):
+    st = os.stat(pdf_path)
+    return {'sha256': _file_sha256(pdf_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def load_text_index(index_path):
+    """
+    Reads an index written by update_text_index(); returns None when there
+    is none or it cannot be used (unreadable, corrupt or another version),
+    so the caller simply rebuilds it.
+    """
+    try:
+        with open(index_path, "rb") as f_index:
+            index = json.loads(zlib.decompress(f_index.read()).decode('utf-8'))
+    except (OSError, zlib.error, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get('format') != TEXT_INDEX_FORMAT or index.get('version') != TEXT_INDEX_VERSION:
+        return None
+    return index
+
+def update_text_index(pdf_path, index_path, page_spec_str=None, workers=1, password=None, fresh_check='stat'):
+    """
+    Brings the text index of `pdf_path` stored at `index_path` up to date for
+    the selected pages and returns (index, extracted_pages). The index is
+    keyed by the SHA-256 of the PDF: an index of other content is discarded,
+    otherwise only pages missing from it are extracted, through the same
+    page loop as extract_text. With fresh_check='stat' an index whose
+    recorded size and mtime match the file is trusted without hashing it.
+
+    The index holds the text of every indexed page (for snippets) and the
+    postings of every token as one string "page:pos,pos page:pos ..." (see
+    _decode_postings), so loading it does not parse the postings of tokens
+    that are not searched for. It is written as zlib-compressed JSON, and
+    only when it changed. The PDF itself is opened only to extract pages.
+    """
+    index = load_text_index(index_path)
+    source = index and index['source']
+    changed = False
+    fingerprint = None
+    st = os.stat(pdf_path)
+    if not (fresh_check == 'stat' and source and source['size'] == st.st_size and source['mtime_ns'] == st.st_mtime_ns):
+        fingerprint = _source_fingerprint(pdf_path)
+        if not source or source['sha256'] != fingerprint['sha256']:
+            index = None
+        elif source != fingerprint:
+            index['source'], changed = fingerprint, True
+    reader = None
+    if index is None:
+        reader = open_pdf_reader(pdf_path, password)
+        index = {'format': TEXT_INDEX_FORMAT, 'version': TEXT_INDEX_VERSION, 'source': fingerprint or _source_fingerprint(pdf_path),
+                 'page_count': len(reader.pages), 'pages': {}, 'postings': {}}
+        changed = True
+    num_total_pages = index['page_count']
+    selected = parse_page_spec(page_spec_str, num_total_pages) if num_total_pages else []
+    missing = [i for i in selected if str(i + 1) not in index['pages']]
+    if missing:
+        reader = reader or open_pdf_reader(pdf_path, password)
+        added = {}
+        for i, text, error in track_progress(iter_page_texts(pdf_path, reader, missing, workers, password), len(missing)):
+            page_key = str(i + 1)
+            index['pages'][page_key] = {'text': text or "", 'error': error}
+            for position, (token, _, _) in enumerate(text_tokens(text)):
+                added.setdefault(token, {}).setdefault(page_key, []).append(str(position))
+        postings = index['postings']
+        for token, pages in added.items():
+            encoded = " ".join(f"{page_key}:{','.join(positions)}" for page_key, positions in pages.items())
+            postings[token] = f"{postings[token]} {encoded}" if token in postings else encoded
+    metrics_count('pages', len(missing))
+    if changed or missing:
+        report_phase('serialize')
+        with metrics_phase('serialize'), atomic_output(index_path) as f_index:
+            f_index.write(zlib.compress(json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6))
+    return index, len(missing)
+
+def parse_search_query(query):
+    """
+    Splits a query into the terms that must all occur on a page: each quoted
+    "phrase" or single word becomes a list of normalized tokens.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query or ""):
+        tokens = [token for token, _, _ in text_tokens(phrase or word)]
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+def _decode_postings(encoded):
+    """{page_number: [token_positions]} from the "page:pos,pos page:pos" form stored in the index."""
+    postings = {}
+    for entry in (encoded or "").split():
+        page_key, positions = entry.split(':')
+        postings[page_key] = [int(position) for position in positions.split(',')]
+    return postings
+
+def _phrase_positions(postings, tokens, page_key):
+    """Token positions on `page_key` where `tokens` occur consecutively."""
+    first = postings.get(tokens[0], {}).get(page_key, [])
+    following = [set(postings.get(token, {}).get(page_key, [])) for token in tokens[1:]]
+    return [p for p in first if all(p + n in positions for n, positions in enumerate(following, 1))]
+
+def search_text_index(index, terms, page_spec_str=None):
+    """
+    Pages of `index` containing all `terms` (see parse_search_query), in
+    page order, with the number of hits and a few snippets around them.
+    """
+    postings = {token: _decode_postings(index['postings'].get(token)) for tokens in terms for token in tokens}
+    candidates = None
+    for tokens in terms:
+        pages = set(postings.get(tokens[0], {}))
+        for token in tokens[1:]:
+            pages &= set(postings.get(token, {}))
+        candidates = pages if candidates is None else candidates & pages
+    if page_spec_str and candidates:
+        allowed = {str(i + 1) for i in parse_page_spec(page_spec_str, index['page_count'])}
+        candidates &= allowed
+    results = []
+    for page_key in sorted(candidates or (), key=int):
+        term_positions = [_phrase_positions(postings, tokens, page_key) for tokens in terms]
+        if not all(term_positions):
+            continue  # all words occur, but not a phrase in sequence
+        spans = [(p, len(tokens)) for tokens, positions in zip(terms, term_positions) for p in positions]
+        text = index['pages'][page_key]['text']
+        spans.sort()
+        # character offsets of the words, tokenized only as far as the snippets reach
+        word_iter, words = _TOKEN_RE.finditer(text), []
+        snippets = []
+        shown_until = -1
+        for position, length in spans:
+            words.extend(m.span() for m in itertools.islice(word_iter, max(0, position + length - len(words))))
+            if position + length > len(words):
+                break
+            start, end = words[position][0], words[position + length - 1][1]
+            if start < shown_until:
+                continue  # already inside the previous snippet
+            if len(snippets) == SEARCH_SNIPPETS_PER_PAGE:
+                break
+            before, after = max(0, start - SEARCH_SNIPPET_CONTEXT), min(len(text), end + SEARCH_SNIPPET_CONTEXT)
+            snippet = text[before:after].split()
+            # drop words cut by the context window
+            if before and not text[before - 1].isspace():
+                snippet = snippet[1:]
+            if after < len(text) and not text[after].isspace():
+                snippet = snippet[:-1]
+            snippets.append(("…" if before else "") + " ".join(snippet) + ("…" if after < len(text) else ""))
+            shown_until = after
+        results.append({'page': int(page_key), 'hits': len(spans), 'snippets': snippets})
+    return results
+
+def build_text_index(pdf_path, index_path, page_spec_str=None, workers=1, password=None):
+    """'index' operation: creates or completes the text index of `pdf_path` at `index_path`."""
+    try:
+        index, extracted = update_text_index(pdf_path, index_path, page_spec_str, workers, password, fresh_check='sha256')
+        return {'pages_indexed': len(index['pages']), 'pages_extracted': extracted, 'page_count': index['page_count'],
+                'tokens': len(index['postings']), 'sha256': index['source']['sha256']}
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {pdf_path}")
+    except WrongPasswordError as wpe:
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::PDF '{os.path.basename(pdf_path)}' for indexing is password protected and the password (--password) is missing or incorrect. {wpe}")
+    except PdfReadError as pre:
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF for indexing: {pre}")
+    except IOError as e:
+        raise IOError(f"{ERR_IO}::Error writing text index to {index_path}: {e}")
+    except ValueError as ve:
+        if str(ve).startswith((ERR_PAGE_RANGE, ERR_INVALID_ARGUMENT)): raise
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error indexing '{os.path.basename(pdf_path)}': {ve}")
+    except Exception as e:
+        raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error indexing '{os.path.basename(pdf_path)}': {type(e).__name__} - {e}")
+
+def search_pdf_text(pdf_path, index_path, query, output_path, page_spec_str=None, workers=1, password=None):
+    """
+    'search' operation: answers `query` from the text index at `index_path`,
+    first indexing pages that are missing from it (all of them when there
+    is no index yet or the PDF changed). Writes the matches as JSON.
+    """
+    try:
+        terms = parse_search_query(query)
+        if not terms:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Search query '{query}' contains no words to search for.")
+        index, extracted = update_text_index(pdf_path, index_path, page_spec_str, workers, password)
+        report_phase('search')
+        matches = search_text_index(index, terms, page_spec_str)
+        result = {'query': query, 'terms': [" ".join(tokens) for tokens in terms], 'page_count': index['page_count'],
+                  'pages_indexed': len(index['pages']), 'pages_extracted': extracted,
+                  'matched_pages': len(matches), 'matches': matches}
+        with atomic_output(output_path, "w", encoding="utf-8") as f_out:
+            json.dump(result, f_out, ensure_ascii=False, indent=2)
+        return output_path
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {pdf_path}")
+    except WrongPasswordError as wpe:
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::PDF '{os.path.basename(pdf_path)}' for search is password protected and the password (--password) is missing or incorrect. {wpe}")
+    except PdfReadError as pre:
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF for search: {pre}")
+    except IOError as e:
+        raise IOError(f"{ERR_IO}::Error writing search results to {output_path}: {e}")
+    except ValueError as ve:
+        if str(ve).startswith((ERR_PAGE_RANGE, ERR_INVALID_ARGUMENT)): raise
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error searching '{os.path.basename(pdf_path)}': {ve}")
+    except Exception as e:
+        raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error searching '{os.path.basename(pdf_path)}': {type(e).__name__} - {e}")
+
+def reverse_pdf_pages(input_path, output_path, password=None, output_options=None, large_file=False):
     writer = PdfWriter()
     try:
-        reader = PdfReader(input_path)
+        if large_file:
+            write_pages_large_file(input_path, output_path, lambda num_total_pages: [(i, 0) for i in reversed(range(num_total_pages))], password)
+            return
+        reader = open_pdf_reader(input_path, password)
         if not reader.pages:
             raise ValueError(f"{ERR_FILE_PROCESSING}::Main PDF '{os.path.basename(input_path)}' for reverse has no pages.")
-        for i in range(len(reader.pages) - 1, -1, -1):
+        for i in track_progress(range(len(reader.pages) - 1, -1, -1)):
             writer.add_page(reader.pages[i])
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+        write_pdf(writer, output_path, output_options)
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except WrongPasswordError as e:
-        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected. Details: {e}")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected and the password (--password) is missing or incorrect. Details: {e}")
     except PdfReadError as pre:
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
     except IOError as e:
@@ -395,28 +2537,39 @@ def reverse_pdf_pages(input_path, output_path):
     finally:
         writer.close()
 
-def duplicate_pages_in_pdf(input_path, output_path, page_spec_str_to_duplicate, duplicate_count=1):
+def duplicate_pages_in_pdf(input_path, output_path, page_spec_str_to_duplicate, duplicate_count=1, password=None, output_options=None,
+                           large_file=False):
     writer = PdfWriter()
     try:
-        reader = PdfReader(input_path)
+        if large_file:
+            def page_plan(num_total_pages):
+                pages_to_duplicate_0_indexed = parse_page_spec(page_spec_str_to_duplicate, num_total_pages)
+                if duplicate_count < 0:
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Duplicate count must be a non-negative integer.")
+                for i in range(num_total_pages):
+                    yield from [(i, 0)] * (1 + (duplicate_count if i in pages_to_duplicate_0_indexed else 0))
+            write_pages_large_file(input_path, output_path, page_plan, password)
+            return
+        reader = open_pdf_reader(input_path, password)
         num_total_pages = len(reader.pages)
         if num_total_pages == 0:
             raise ValueError(f"{ERR_FILE_PROCESSING}::Main PDF '{os.path.basename(input_path)}' for duplicate has no pages.")
         pages_to_duplicate_0_indexed = parse_page_spec(page_spec_str_to_duplicate, num_total_pages)
         if duplicate_count < 0:
             raise ValueError(f"{ERR_INVALID_ARGUMENT}::Duplicate count must be a non-negative integer.")
-        for i in range(num_total_pages):
+        for i in track_progress(range(num_total_pages)):
             page = reader.pages[i]
             writer.add_page(page)
             if i in pages_to_duplicate_0_indexed:
+                # copies are new page dictionaries referencing the content
+                # and resources already copied for `page`
                 for _ in range(duplicate_count):
-                    writer.add_page(page)
-        with open(output_path, "wb") as f_out:
-            writer.write(f_out)
+                    writer.add_page(_copy_page(page))
+        write_pdf(writer, output_path, output_options)
     except FileNotFoundError:
         raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
     except WrongPasswordError as e:
-        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected. Details: {e}")
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected and the password (--password) is missing or incorrect. Details: {e}")
     except PdfReadError as pre:
         raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
     except IOError as e:
@@ -429,128 +2582,1048 @@ def duplicate_pages_in_pdf(input_path, output_path, page_spec_str_to_duplicate,
     finally:
         writer.close()
 
-def main():
-    parser = argparse.ArgumentParser(description="PDF processing script using pypdf.", add_help=False)
+INHERITABLE_PAGE_KEYS = ('/MediaBox', '/CropBox', '/Rotate', '/Resources')
+INFO_TEXT_SAMPLE_PAGES = 20
+
+def iter_page_tree(reader):
+    """
+    Yields (page_dict, inherited_attributes) for every leaf of the page tree
+    in document order, without building PageObjects or touching content.
+    """
+    root = reader.trailer['/Root'].get_object()['/Pages'].get_object()
+    stack = [(root, {})]
+    seen = set()
+    while stack:
+        node, inherited = stack.pop()
+        ref = node.indirect_reference
+        if ref is not None:
+            if ref.idnum in seen:
+                continue
+            seen.add(ref.idnum)
+        attrs = dict(inherited)
+        for key in INHERITABLE_PAGE_KEYS:
+            if key in node:
+                attrs[key] = node[key]
+        if '/Kids' in node:
+            for kid in reversed(node['/Kids'].get_object()):
+                stack.append((kid.get_object(), attrs))
+        else:
+            yield node, attrs
+
+def pdf_page_count(reader):
+    """Page count from the root /Pages /Count, i.e. without walking the page tree."""
+    return int(reader.trailer['/Root'].get_object()['/Pages'].get_object()['/Count'])
+
+def _encryption_info(reader):
+    encrypt = reader.trailer.get('/Encrypt')
+    if encrypt is None:
+        return None
+    encrypt = encrypt.get_object()
+    version, length = int(encrypt.get('/V', 0)), int(encrypt.get('/Length', 40))
+    if version == 5:
+        algorithm = 'AES-256'
+    elif version == 4:
+        crypt_filter = encrypt.get('/CF', {}).get(encrypt.get('/StmF', '/StdCF'), {})
+        algorithm = {'/AESV2': 'AES-128', '/AESV3': 'AES-256'}.get(crypt_filter.get('/CFM'), 'RC4-128')
+    else:
+        algorithm = f"RC4-{length if version == 2 else 40}"
+    return {'filter': str(encrypt.get('/Filter', '')).lstrip('/'), 'version': version,
+            'revision': int(encrypt.get('/R', 0)), 'algorithm': algorithm}
+
+def pdf_info(input_path, output_path, password=None, page_spec_str=None, summary_only=False):
+    """
+    Writes a JSON description of the PDF (version, size, encryption, page
+    count, per-page media box and rotation, ...) to `output_path`. Only the
+    trailer, xref and page tree dictionaries are read, through an open file
+    handle so the file is not loaded as a whole; page contents are never
+    decoded. Encrypted files are opened with `password` or the empty user
+    password; if neither works only the encryption details are reported.
+    With `page_spec_str` the specification is validated against the page
+    count, failing with PAGE_RANGE_ERROR like the real operations would.
+    """
+    try:
+        with open(input_path, "rb") as f_in:
+            reader = PdfReader(f_in)
+            info = {
+                'file': os.path.basename(input_path),
+                'file_size': os.fstat(f_in.fileno()).st_size,
+                'pdf_version': reader.pdf_header.replace('%PDF-', ''),
+                'object_count': sum(len(entries) for entries in reader.xref.values()) + len(reader.xref_objStm),
+                'encrypted': reader.is_encrypted,
+                'encryption': _encryption_info(reader),
+                'decrypted': None,
+                'page_count': None,
+                'has_text': None,
+            }
+            if reader.is_encrypted:
+                info['decrypted'] = bool(reader.decrypt(password or ""))
+            if not reader.is_encrypted or info['decrypted']:
+                info['page_count'] = pdf_page_count(reader)
+                if not summary_only:
+                    pages = []
+                    has_text = False
+                    for n, (page, attrs) in enumerate(track_progress(iter_page_tree(reader), info['page_count']), 1):
+                        box = [float(v) for v in attrs.get('/MediaBox', [0, 0, 612, 792])]
+                        pages.append({'page': n, 'mediabox': box,
+                                      'width': abs(box[2] - box[0]), 'height': abs(box[3] - box[1]),
+                                      'rotation': int(attrs.get('/Rotate', 0)) % 360})
+                        if not has_text and n <= INFO_TEXT_SAMPLE_PAGES:
+                            resources = attrs.get('/Resources')
+                            fonts = resources.get_object().get('/Font') if resources is not None else None
+                            has_text = bool(fonts is not None and fonts.get_object())
+                    info['page_count'] = len(pages)
+                    info['has_text'] = has_text
+                    info['pages'] = pages
+                if page_spec_str:
+                    info['selected_page_count'] = len(parse_page_spec(page_spec_str, info['page_count']))
+            elif page_spec_str:
+                raise ValueError(f"{ERR_DECRYPTION_FAILED}::Cannot validate pages of '{os.path.basename(input_path)}': it is password protected and no valid password was given.")
+        with atomic_output(output_path, "w", encoding="utf-8") as f_out:
+            json.dump(info, f_out)
+        return info
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input PDF not found: {input_path}")
+    except PdfReadError as pre:
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF '{os.path.basename(input_path)}': {pre}")
+    except IOError as e:
+        raise IOError(f"{ERR_IO}::Error writing PDF info to {output_path}: {e}")
+    except ValueError as ve:
+        if str(ve).startswith((ERR_PAGE_RANGE, ERR_DECRYPTION_FAILED)): raise
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF structure of '{os.path.basename(input_path)}': {ve}")
+    except Exception as e:
+        raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error reading info of '{os.path.basename(input_path)}': {type(e).__name__} - {e}")
+
+PIPELINE_STEPS = ['decrypt', 'delete_pages', 'rotate', 'overlay', 'duplicate_pages', 'reverse_pages', 'encrypt']
+
+def load_pipeline_plan(plan):
+    """
+    Accepts the --plan value: a JSON list of steps, either inline or in a file.
+    Each step is a dict with an "op" key and the same option names as the CLI,
+    e.g. [{"op": "decrypt", "password": "x"}, {"op": "rotate", "angle": 90, "pages": "1-3"}].
+    """
+    try:
+        if isinstance(plan, str):
+            if os.path.isfile(plan):
+                with open(plan, "r", encoding="utf-8") as f_plan:
+                    plan = json.load(f_plan)
+            else:
+                plan = json.loads(plan)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline plan is neither a readable JSON file nor valid JSON: {e}")
+    if not isinstance(plan, list) or not plan:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline plan must be a non-empty JSON list of steps.")
+    for n, step in enumerate(plan, 1):
+        if not isinstance(step, dict) or step.get('op') not in PIPELINE_STEPS:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n} must be an object with 'op' in {', '.join(PIPELINE_STEPS)}.")
+        if step['op'] == 'decrypt' and n != 1:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'decrypt' is only allowed as the first step.")
+        if step['op'] == 'encrypt' and n != len(plan):
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'encrypt' is only allowed as the last step.")
+    return plan
+
+def _copy_page(page):
+    """
+    New page dictionary sharing content and resources with `page`, so later
+    steps can change one copy (e.g. its /Rotate) without touching the others.
+    """
+    copy = PageObject(page.pdf)
+    copy.update(page)
+    return copy
+
+def run_pdf_pipeline(input_path, output_path, steps, cache_dir=None, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES,
+                     password=None, output_options=None):
+    """
+    Applies several edits to one in-memory page list: the input is parsed
+    once and the output written once. Page specifications in each step refer
+    to the pages as they are after the previous step, exactly as if the steps
+    were run one by one through their standalone operations.
+    """
+    writer = PdfWriter()
+    try:
+        steps = load_pipeline_plan(steps)
+        if steps[0]['op'] == 'decrypt' and steps[0].get('password'):
+            password = steps[0]['password']
+        reader = open_pdf_reader(input_path, password)
+        pages = list(reader.pages)
+        if not pages:
+            raise ValueError(f"{ERR_FILE_PROCESSING}::Cannot run a pipeline on an empty PDF: '{os.path.basename(input_path)}'.")
+
+        for n, step in enumerate(track_progress(steps, phase='steps'), 1):
+            op = step['op']
+            if op == 'delete_pages':
+                if not step.get('pages'):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'delete_pages' requires 'pages'.")
+                to_delete = parse_page_spec(step['pages'], len(pages))
+                if len(to_delete) == len(pages):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: deleting all pages. Resulting PDF would be empty.")
+                pages = [page for i, page in enumerate(pages) if i not in to_delete]
+            elif op == 'rotate':
+                if step.get('angle') not in (0, 90, 180, 270):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'rotate' requires 'angle' of 0, 90, 180 or 270.")
+                to_rotate = parse_page_spec(step.get('pages') or 'all', len(pages))
+                for i in to_rotate:
+                    pages[i] = _copy_page(pages[i]).rotate(step['angle'])
+            elif op == 'overlay':
+                if not step.get('overlay_pdf'):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'overlay' requires 'overlay_pdf'.")
+                position, scale = step.get('overlay_position', 'center'), step.get('overlay_scale', 1.0)
+                targets = parse_page_spec(step.get('pages') or 'all', len(pages))
+                max_pixels = _overlay_max_pixels(step['overlay_pdf'], step.get('overlay_dpi'), pages, targets, position, scale)
+                try:
+                    overlay_reader = _make_pdf_reader(step['overlay_pdf'], cache_dir, max_pixels, cache_max_bytes)
+                except WrongPasswordError as wpe:
+                    raise ValueError(f"{ERR_DECRYPTION_FAILED}::Pipeline step {n}: overlay PDF '{os.path.basename(step['overlay_pdf'])}' is password protected and cannot be used as an overlay: {wpe}")
+                overlay_number = step.get('overlay_page_number', 1)
+                if not (1 <= overlay_number <= len(overlay_reader.pages)):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: overlay page {overlay_number} out of range (1–{len(overlay_reader.pages)}).")
+                overlay_form = OverlayForm(writer, overlay_reader.pages[overlay_number - 1], position, scale)
+                for i in targets:
+                    pages[i] = overlay_form.apply(_copy_page(pages[i]))
+            elif op == 'duplicate_pages':
+                count = step.get('duplicate_count', 1)
+                if not step.get('pages'):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'duplicate_pages' requires 'pages'.")
+                if not isinstance(count, int) or count < 0:
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'duplicate_count' must be 0 or greater.")
+                to_duplicate = parse_page_spec(step['pages'], len(pages))
+                duplicated = []
+                for i, page in enumerate(pages):
+                    duplicated.append(page)
+                    if i in to_duplicate:
+                        duplicated.extend(_copy_page(page) for _ in range(count))
+                pages = duplicated
+            elif op == 'reverse_pages':
+                pages.reverse()
+            elif op == 'encrypt':
+                if not step.get('user_password'):
+                    raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline step {n}: 'encrypt' requires 'user_password'.")
+
+        for page in track_progress(pages):
+            writer.add_page(page)
+        if steps[-1]['op'] == 'encrypt':
+            output_options = dict(output_options or {}, encrypt=(steps[-1]['user_password'], steps[-1].get('owner_password')))
+        write_pdf(writer, output_path, output_options)
+    except FileNotFoundError as fnf:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input not found: {fnf.filename or input_path}")
+    except WrongPasswordError:
+        raise ValueError(f"{ERR_DECRYPTION_FAILED}::Input PDF '{os.path.basename(input_path)}' is password protected. Start the pipeline with a 'decrypt' step or pass the correct --password.")
+    except PdfReadError as pre:
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error reading PDF during pipeline on '{os.path.basename(input_path)}': {pre}")
+    except IOError as e:
+        raise IOError(f"{ERR_IO}::Error writing pipeline output PDF {output_path}: {e}")
+    except ValueError as ve:
+        if str(ve).startswith((ERR_PAGE_RANGE, ERR_INVALID_ARGUMENT, ERR_DECRYPTION_FAILED, ERR_FILE_PROCESSING)): raise
+        raise ValueError(f"{ERR_FILE_PROCESSING}::Error during pipeline on '{os.path.basename(input_path)}': {ve}")
+    except Exception as e:
+        raise RuntimeError(f"{ERR_FILE_PROCESSING}::Unexpected error during pipeline on '{os.path.basename(input_path)}': {type(e).__name__} - {e}")
+    finally:
+        writer.close()
+
+OPERATIONS = ['merge', 'rotate', 'delete_pages', 'extract_pages',
+              'encrypt', 'decrypt', 'overlay', 'extract_text',
+              'reverse_pages', 'duplicate_pages', 'pipeline', 'info', 'split', 'index', 'search']
+
+class JobArgumentParser(argparse.ArgumentParser):
+    """
+    Argument parser for jobs received in server mode: reports bad arguments
+    as INVALID_ARGUMENT errors instead of printing usage and exiting.
+    """
+    def error(self, message):
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::{message}")
+
+def build_arg_parser(parser_class=argparse.ArgumentParser):
+    parser = parser_class(description="PDF processing script using pypdf.", add_help=False)
     required_args = parser.add_argument_group('required arguments')
     optional_args = parser.add_argument_group('optional arguments')
+    server_args = parser.add_argument_group('server and batch mode')
+    diagnostics_args = parser.add_argument_group('diagnostics')
 
-    required_args.add_argument('--operation', required=True,
-                        choices=['merge', 'rotate', 'delete_pages', 'extract_pages',
-                                 'encrypt', 'decrypt', 'overlay', 'extract_text',
-                                 'reverse_pages', 'duplicate_pages'],
+    required_args.add_argument('--operation',
+                        choices=OPERATIONS,
                         help="The PDF operation to perform.")
-    required_args.add_argument('--input', nargs='+', required=True,
-                        help="Full path(s) to the input PDF file(s). First input is primary for most ops.")
-    required_args.add_argument('--output', required=True,
-                        help="Full path for the output PDF/text file.")
+    required_args.add_argument('--input', nargs='+',
+                        help="Full path(s) to the input PDF file(s). First input is primary for most ops. '-' reads standard input, fd:N an inherited file descriptor.")
+    required_args.add_argument('--output',
+                        help="Full path for the output PDF/text file. '-' writes the output to standard output (instead of its path), fd:N to an inherited file descriptor.")
 
     optional_args.add_argument('--pages',
-                        help="Page specification (e.g., '1,3-5,all') for rotate, delete_pages, extract_pages, extract_text, overlay (target pages), duplicate_pages. Default: 'all' where applicable.")
+                        help="Page specification (e.g., '1,3-5', '-3', '10-', 'last-1', 'odd', '1-last:2', 'all') for rotate, delete_pages, extract_pages, extract_text, overlay (target pages), duplicate_pages. Default: 'all' where applicable. Pass specs starting with '-' as --pages=-3.")
     optional_args.add_argument('--angle', type=int, choices=[0, 90, 180, 270],
                         help="Rotation angle (for 'rotate' operation).")
-    optional_args.add_argument('--user-password', help="User password for encryption.")
+    optional_args.add_argument('--incremental', action='store_true',
+                               help="For 'rotate': append only the changed page objects to a copy of the input as a PDF incremental update instead of rewriting the file.")
+    optional_args.add_argument('--large-file', action='store_true',
+                               help="For rotate, delete_pages, extract_pages, reverse_pages and duplicate_pages: memory-map the input, "
+                                    "resolve only the objects of the selected pages and write each page out as soon as it is copied.")
+    optional_args.add_argument('--user-password',
+                               help="User password for 'encrypt'. With --reencrypt, the output of any other operation producing PDFs is encrypted with it.")
     optional_args.add_argument('--owner-password', help="Owner password for encryption (optional).")
-    optional_args.add_argument('--password', help="Password for decryption.")
-    optional_args.add_argument('--overlay-pdf', help="Path to the PDF to use as an overlay/watermark.")
+    optional_args.add_argument('--password',
+                               help="Password for decryption; every operation uses it to open encrypted inputs (for 'merge': all inputs without an --input-passwords entry).")
+    optional_args.add_argument('--input-passwords', nargs='+', metavar='PASSWORD',
+                               help="For 'merge': one password per --input, in the same order; use '' for inputs that are not encrypted.")
+    optional_args.add_argument('--reencrypt', action='store_true',
+                               help="Encrypt the output again, with --user-password or else the password used to open the input (--password), so it stays protected.")
+    optional_args.add_argument('--overlay-pdf', help="Path to the PDF to use as an overlay/watermark ('-' or fd:N to stream it).")
     optional_args.add_argument('--overlay-page-number', type=int, default=1,
                         help="1-indexed page from overlay-pdf to use (e.g., 0 for 1st page). Default: 0.")
+    optional_args.add_argument('--overlay-position', choices=OVERLAY_POSITIONS, default='center',
+                        help="Where to draw the overlay on each target page: centered, scaled to fit, tiled or in a corner (default: center).")
+    optional_args.add_argument('--overlay-scale', type=float, default=1.0,
+                        help="Scale factor for the overlay; for 'fit' it is applied on top of the fitted size (default: 1.0).")
+    optional_args.add_argument('--overlay-dpi', type=float,
+                        help="Downsample image overlays to this resolution at their placed size (default: embed at full resolution).")
+    optional_args.add_argument('--optimize', type=int, choices=OPTIMIZE_LEVELS, default=0,
+                               help="Optimize PDF output. 1: compress uncompressed streams, store identical objects (images, fonts, resources) once and drop unreferenced objects; 2: also pack objects into compressed object streams. Input and output byte counts are reported on stderr; with --metrics also the size the output would have had unoptimized.")
+    optional_args.add_argument('--linearize', action='store_true',
+                               help="Write PDF output linearized (fast web view): page 1 is at the front with hint tables, so viewers show it before the rest is downloaded.")
+    optional_args.add_argument('--cache-dir', default=os.environ.get('PDF_CACHE_DIR'),
+                        help="Directory for cached conversions, e.g. image overlays (default: $PDF_CACHE_DIR, caching off when unset).")
+    optional_args.add_argument('--cache-results', action='store_true',
+                        help="Reuse the output of an earlier run with identical input content and arguments from --cache-dir.")
+    optional_args.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="Size cap of --cache-dir; least recently used entries are evicted (default: 256).")
+    optional_args.add_argument('--text-format', choices=TEXT_FORMATS, default='text',
+                        help="Output format for 'extract_text': '--- Page N ---' text blocks, or one JSON record per page as NDJSON or a JSON document (default: text).")
+    optional_args.add_argument('--text-workers', type=int, default=1,
+                        help="Worker processes for 'extract_text', 'index' and 'search' on large documents; page order is preserved (default: 1).")
+    optional_args.add_argument('--query',
+                        help="For 'search': words that must all occur on a page; \"quoted phrases\" must occur in sequence. Case and accents are ignored.")
+    optional_args.add_argument('--index', metavar='FILE',
+                        help="For 'search': text index of the input written by 'index' (it is created or completed first if pages are missing or the PDF changed).")
+    optional_args.add_argument('--info-summary', action='store_true',
+                        help="For 'info': only report document level data (page count from the page tree root), no per-page list.")
+    optional_args.add_argument('--memory-budget-mb', type=int,
+                        help="For 'merge': use the bounded-memory streaming merge (one input open at a time, objects written as they are copied, identical fonts/images stored once; outlines are dropped) and fail with FILE_PROCESSING_ERROR when the resident memory exceeds this budget; merge statistics are reported on stderr.")
+    optional_args.add_argument('--chunk-size', type=int,
+                        help="For 'split': number of pages per output part.")
+    optional_args.add_argument('--split-pages',
+                        help="For 'split': ';'-separated page specifications, one output part each (e.g. '1-3;4-10;11-last').")
+    optional_args.add_argument('--max-bytes', type=int,
+                        help="For 'split': start a new part when the estimated part size would exceed this many bytes.")
+    optional_args.add_argument('--split-workers', type=int, default=1,
+                        help="For 'split': number of parts written concurrently (default: 1).")
     optional_args.add_argument('--duplicate-count', type=int, default=1,
                         help="Number of *additional* copies for 'duplicate_pages' (default: 1).")
+    optional_args.add_argument('--plan',
+                        help="JSON list of steps (inline or path to a .json file) for 'pipeline', e.g. '[{\"op\": \"rotate\", \"angle\": 90}]'.")
     optional_args.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
-    args = parser.parse_args()
+    diagnostics_args.add_argument('--metrics', nargs='?', const='stderr', metavar='FILE',
+                                  help="Report per-phase timings (open, page loop, optimize, encrypt, serialize, fsync), pages, bytes read/written and peak RSS as one JSON line on stderr, or appended to FILE. Jobs also return it in their 'metrics' field.")
+    diagnostics_args.add_argument('--progress', nargs='?', const='stderr', metavar='FILE',
+                                  help="Emit NDJSON progress lines ({\"progress\": {phase, done, total, ...}}) from the page loops on stderr, or append them to FILE.")
+    diagnostics_args.add_argument('--deadline-seconds', type=float,
+                                  help="Abort cleanly with DEADLINE_EXCEEDED (exit code 9) when the operation runs longer; checked between pages. No output file is left behind.")
+    diagnostics_args.add_argument('--profile', metavar='FILE',
+                                  help="Write a cProfile dump of the run to FILE (inspect with python -m pstats FILE).")
+    server_args.add_argument('--serve', action='store_true',
+                        help="Run as a long-lived server reading JSON-lines jobs from stdin (or --socket) and answering with JSON-lines results.")
+    server_args.add_argument('--socket',
+                        help="Unix socket path to listen on in server mode instead of stdin/stdout.")
+    server_args.add_argument('--batch', metavar='JOBS_FILE',
+                        help="Run every JSON job line of JOBS_FILE on a process pool and write NDJSON results to --output (default: stdout).")
+    server_args.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes in server or batch mode (default: CPU count).")
+    server_args.add_argument('--max-jobs-per-worker', type=int, default=100,
+                        help="Recycle a worker process after this many jobs, 0 to never recycle (default: 100).")
+    return parser
+
+def check_required_args(args):
+    missing = [flag for flag, value in (('--operation', args.operation), ('--input', args.input), ('--output', args.output)) if not value]
+    if missing:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::The following arguments are required: {', '.join(missing)}")
+
+# Arguments that never change the produced file; everything else is part of the result cache key.
+RESULT_CACHE_IGNORED_ARGS = {'input', 'output', 'cache_dir', 'cache_max_mb', 'cache_results', 'metrics', 'profile', 'progress', 'deadline_seconds',
+                             'serve', 'socket', 'batch', 'workers', 'max_jobs_per_worker', 'text_workers',
+                             'split_workers', 'reported_stats'}
+
+# operations whose result is not a single file
+UNCACHED_OPERATIONS = {'split', 'index', 'search'}
+
+def cache_secret(cache_dir):
+    """
+    The random key of `cache_dir`, created on first use (readable by the
+    owner only). Raises OSError when it can be neither read nor created.
+    """
+    path = os.path.join(cache_dir, CACHE_SECRET_NAME)
+    try:
+        with open(path, "rb") as f_secret:
+            return f_secret.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, "wb") as f_tmp:
+            f_tmp.write(os.urandom(32))
+        os.link(tmp_path, path)  # a concurrent first use keeps whichever key was linked first
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp_path)
+    with open(path, "rb") as f_secret:
+        return f_secret.read()
+
+def _secret_digest(value, secret):
+    return "hmac-sha256:" + hmac.new(secret, str(value).encode('utf-8'), hashlib.sha256).hexdigest()
+
+def _plan_for_cache_key(plan, secret):
+    # steps name overlay files and passwords: key them by content hash and digest instead
+    steps = []
+    for step in load_pipeline_plan(plan):
+        step = dict(step)
+        for name, value in step.items():
+            if 'password' in name and value is not None:
+                step[name] = _secret_digest(value, secret)
+        if step.get('overlay_pdf'):
+            step['overlay_pdf'] = _file_sha256(step['overlay_pdf'])
+        steps.append(step)
+    return steps
+
+def result_cache_key(args, secret):
+    """
+    SHA-256 over the content of every input file and the normalized
+    arguments that affect the output. Passwords only enter as HMACs keyed
+    with the cache directory's `secret`, so cache file names cannot be used
+    to test password guesses; overlay/plan files enter by content, never by
+    path.
+    """
+    key_args = {}
+    for name, value in sorted(vars(args).items()):
+        if name in RESULT_CACHE_IGNORED_ARGS or value is None:
+            continue
+        if 'password' in name:
+            value = _secret_digest(value, secret)
+        elif name == 'pages':
+            value = "".join(value.split()).lower()
+        elif name == 'overlay_pdf':
+            value = _file_sha256(value)
+        elif name == 'plan':
+            value = _plan_for_cache_key(value, secret)
+        key_args[name] = value
+    material = {
+        'version': 1,
+        'inputs': [_file_sha256(path) for path in args.input],
+        'args': key_args,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+def run_operation(args):
+    """
+    Validates the parsed arguments, runs the requested operation and returns
+    the generated output path (for split: the JSON manifest of the written
+    parts). Errors are raised, never turned into exit codes.
+    With --progress, NDJSON progress lines are emitted from the page loops;
+    --deadline-seconds aborts the run between pages with DEADLINE_EXCEEDED.
+    With --metrics the run's phase timings and counters are emitted as one
+    JSON line (and kept in args.metrics_report); with --profile a cProfile
+    dump of the run is written.
+    """
+    global _current_metrics, _current_run
+    _current_metrics = OperationMetrics()
+    _current_run = RunControl(args.operation, args.progress, args.deadline_seconds)
+    profiler = cProfile.Profile() if args.profile else None
+    io_before = _process_io_counters()
+    started = time.perf_counter()
+    error = None
+    memory_files = []
+    try:
+        if profiler:
+            profiler.enable()
+        output_stream = resolve_stream_args(args, memory_files)
+        output_file_generated = _run_operation(args)
+        if output_stream is not None:
+            copy_to_stream(args.output, output_stream)
+            # stdout now carries the output itself
+            output_file_generated = '' if output_stream == STDIO_STREAM else output_stream
+        return output_file_generated
+    except (Exception, OperationAborted) as e:
+        error = e
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.metrics:
+            args.metrics_report = metrics_report(args, time.perf_counter() - started, io_before, error)
+            emit_metrics(args.metrics, args.metrics_report)
+        close_memory_files(memory_files)
+
+def resolve_stream_args(args, memory_files):
+    """
+    Replaces '-' and 'fd:N' in --input, --overlay-pdf and --output with
+    paths of the streamed data (see open_stream_input/open_stream_output),
+    so the operations work on them like on files without a disk round trip.
+    Returns the output stream spec, or None when --output is a path.
+    """
+    input_specs = [spec for spec in args.input + [args.overlay_pdf or ''] if is_stream_spec(spec)]
+    if input_specs.count(STDIO_STREAM) > 1:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Standard input can be read only once; use fd:N for further streamed inputs.")
+    args.input = [open_stream_input(spec, memory_files) if is_stream_spec(spec) else spec for spec in args.input]
+    if args.overlay_pdf and is_stream_spec(args.overlay_pdf):
+        args.overlay_pdf = open_stream_input(args.overlay_pdf, memory_files)
+    if not args.output or not is_stream_spec(args.output):
+        return None
+    if args.operation == 'split':
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Split writes several files and needs an output directory, not {args.output}.")
+    output_stream = args.output
+    args.output = open_stream_output(memory_files)
+    return output_stream
+
+def metrics_report(args, wall_seconds, io_before, error=None):
+    phases = {name: round(_current_metrics.phases.get(name, 0.0), 6) for name in METRICS_PHASES}
+    measured = sum(seconds for name, seconds in _current_metrics.phases.items() if name != 'page_loop')
+    phases['page_loop'] = round(max(0.0, wall_seconds - measured), 6)
+    io_after = _process_io_counters()
+    report = {
+        'operation': args.operation,
+        'ok': error is None,
+        'error': describe_error(error)[1] if error is not None else None,
+        'wall_s': round(wall_seconds, 6),
+        'import_s': round(IMPORT_SECONDS, 6),
+        'phases_s': phases,
+        'pages': _current_metrics.counters.get('pages', 0),
+        'input_bytes': sum(_path_bytes(path) or 0 for path in args.input),
+        'output_bytes': _path_bytes(args.output) if args.output and error is None else None,
+        'bytes_read': io_after[0] - io_before[0] if io_before and io_after else None,
+        'bytes_written': io_after[1] - io_before[1] if io_before and io_after else None,
+        'peak_rss_bytes': _peak_rss_bytes(),
+    }
+    return report
+
+def emit_metrics(destination, report):
+    """Writes the report as one JSON line to stderr ('stderr') or appends it to a file."""
+    line = json.dumps({'metrics': report})
+    if destination == 'stderr':
+        print(line, file=sys.stderr)
+        return
+    try:
+        with open(destination, "a", encoding='utf-8') as f_metrics:
+            f_metrics.write(line + "\n")
+    except OSError as e:
+        print(f"{ERR_IO}::Cannot write metrics to {destination}: {e}", file=sys.stderr)
+
+def report_stats(args, name, stats):
+    """Prints `stats` as a {name: stats} JSON line on stderr, keeping it for the result cache."""
+    line = json.dumps({name: stats})
+    print(line, file=sys.stderr)
+    if getattr(args, 'reported_stats', None) is not None:
+        args.reported_stats.append(line)
+
+def _run_operation(args):
+    """run_operation() without metrics; with --cache-results a previous identical
+    run is served from --cache-dir by copying its output and repeating the
+    stats lines it printed."""
+    for in_path in args.input:
+        if not os.path.exists(in_path):
+            raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input file not found: {in_path}")
+        if not os.path.isfile(in_path):
+             raise ValueError(f"{ERR_INVALID_ARGUMENT}::Input path is not a file: {in_path}")
+
+    if args.operation not in ['merge'] and len(args.input) != 1:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Operation '{args.operation}' requires exactly one primary input PDF via --input (received {len(args.input)}).")
+
+    if not args.cache_results or args.operation in UNCACHED_OPERATIONS:
+        return _dispatch_operation(args)
+    if not args.cache_dir:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--cache-results requires --cache-dir (or PDF_CACHE_DIR).")
+    try:
+        secret = cache_secret(args.cache_dir)
+    except OSError:
+        return _dispatch_operation(args)  # an unusable cache is never fatal
+    try:
+        key = result_cache_key(args, secret)
+    except OSError as e:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Cannot read input for result cache: {e}")
+    suffix = os.path.splitext(args.output)[1] or '.out'
+    cached, cached_stats = cache_lookup(args.cache_dir, key, suffix), cache_lookup(args.cache_dir, key, '.stats')
+    if cached and cached_stats:
+        try:
+            with open(cached_stats, encoding='utf-8') as f_stats:
+                stats_lines = f_stats.read().splitlines()
+            with open(cached, "rb") as f_cached, atomic_output(args.output) as f_out:
+                shutil.copyfileobj(f_cached, f_out, 1024 * 1024)
+            for line in stats_lines:
+                print(line, file=sys.stderr)
+            return args.output
+        except FileNotFoundError:
+            pass  # evicted in the meantime
+        except OSError as e:
+            raise IOError(f"{ERR_IO}::Error copying cached result to {args.output}: {e}")
+    args.reported_stats = []
+    output_file_generated = _dispatch_operation(args)
+    max_bytes = args.cache_max_mb * 1024 * 1024
+    cache_store(args.cache_dir, key, '.stats', "".join(line + "\n" for line in args.reported_stats).encode('utf-8'), max_bytes)
+    cache_store_file(args.cache_dir, key, suffix, output_file_generated, max_bytes)
+    return output_file_generated
+
+def input_passwords(args):
+    """
+    Password to open each --input with: its --input-passwords entry ('' for
+    none), falling back to --password.
+    """
+    if not args.input_passwords:
+        return [args.password] * len(args.input)
+    if len(args.input_passwords) != len(args.input):
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--input-passwords needs one entry per --input ({len(args.input)}), received {len(args.input_passwords)}.")
+    return [password or args.password for password in args.input_passwords]
+
+def output_options(args):
+    """
+    Options for write_pdf(): with --reencrypt the output PDF is encrypted
+    (with --user-password, else the input's password), with
+    --optimize it is optimized (with --metrics also measuring the
+    unoptimized size), with --linearize it is linearized.
+    """
+    options = {}
+    if args.optimize:
+        options.update(optimize=args.optimize, optimize_stats=[],
+                       input_bytes=sum(_path_bytes(path) or 0 for path in args.input or []))
+        if args.metrics:
+            options['measure_unoptimized'] = True
+    if args.linearize:
+        options['linearize'] = True
+    if args.operation != 'encrypt' and args.user_password and not args.reencrypt:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--user-password is used by 'encrypt'; add --reencrypt to encrypt the output of '{args.operation}' with it.")
+    if args.operation != 'encrypt' and args.reencrypt:
+        user_password = args.user_password
+        if not user_password:
+            user_password = args.password or next((password for password in input_passwords(args) if password), None)
+        if not user_password:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::--reencrypt requires --password (or --user-password) to encrypt the output with.")
+        options['encrypt'] = (user_password, args.owner_password)
+    if options and args.operation in ('extract_text', 'info', 'index', 'search'):
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::Operation '{args.operation}' does not produce a PDF; --reencrypt/--user-password/--optimize/--linearize cannot be applied.")
+    return options
+
+def _dispatch_operation(args):
     output_file_generated = None
+    options = output_options(args)
+    if args.large_file:
+        if args.operation not in LARGE_FILE_OPERATIONS:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::--large-file is supported only for: {', '.join(LARGE_FILE_OPERATIONS)}.")
+        if options or args.incremental:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::--large-file writes pages as they are read and cannot be combined with --incremental/--reencrypt/--user-password/--optimize/--linearize.")
+
+    if args.operation == 'merge':
+        if len(args.input) < 2:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Merge operation requires at least two input files.")
+        passwords = input_passwords(args)
+        if args.memory_budget_mb is not None:
+            if options:
+                raise ValueError(f"{ERR_INVALID_ARGUMENT}::The streaming merge (--memory-budget-mb) cannot encrypt, --optimize or --linearize its output.")
+            stats = merge_pdfs_streaming(args.input, args.output, args.memory_budget_mb * 1024 * 1024, passwords)
+            report_stats(args, 'merge_stats', stats)
+        else:
+            merge_pdfs(args.input, args.output, passwords, options)
+        output_file_generated = args.output
+    elif args.operation == 'rotate':
+        if args.angle is None:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Rotate operation requires --angle.")
+        if args.incremental and options:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::--incremental only appends the changed pages and cannot be combined with --reencrypt/--user-password/--optimize/--linearize.")
+        rotate_pages_in_pdf(args.input[0], args.output, args.angle, args.pages or 'all', args.password, options, args.incremental,
+                            args.large_file)
+        output_file_generated = args.output
+    elif args.operation == 'delete_pages':
+        if not args.pages:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Delete pages operation requires --pages to delete.")
+        delete_pages_from_pdf(args.input[0], args.output, args.pages, args.password, options, args.large_file)
+        output_file_generated = args.output
+    elif args.operation == 'extract_pages':
+        if not args.pages:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Extract pages operation requires --pages to extract.")
+        extract_specific_pages(args.input[0], args.output, args.pages, args.password, options, args.large_file)
+        output_file_generated = args.output
+    elif args.operation == 'encrypt':
+        if not args.user_password:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Encrypt operation requires --user-password.")
+        encrypt_pdf_file(args.input[0], args.output, args.user_password, args.owner_password, options)
+        output_file_generated = args.output
+    elif args.operation == 'decrypt':
+        if not args.password:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Decrypt operation requires --password.")
+        decrypt_pdf_file(args.input[0], args.output, args.password, options)
+        output_file_generated = args.output
+    elif args.operation == 'overlay':
+        if not args.overlay_pdf:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Overlay operation requires --overlay-pdf.")
+        if not os.path.exists(args.overlay_pdf):
+             raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Overlay PDF file not found: {args.overlay_pdf}")
+        overlay_pdf_pages(args.input[0], args.overlay_pdf, args.output, args.overlay_page_number, args.pages or 'all',
+                          args.overlay_position, args.overlay_scale, args.overlay_dpi,
+                          args.cache_dir, args.cache_max_mb * 1024 * 1024, args.password, options)
+        output_file_generated = args.output
+    elif args.operation == 'extract_text':
+        output_file_generated = extract_text_from_pdf(args.input[0], args.pages or 'all', args.output, args.text_format,
+                                                      args.text_workers, args.password)
+    elif args.operation == 'reverse_pages':
+        reverse_pdf_pages(args.input[0], args.output, args.password, options, args.large_file)
+        output_file_generated = args.output
+    elif args.operation == 'duplicate_pages':
+        if not args.pages:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Duplicate pages operation requires --pages to specify which pages to duplicate.")
+        if args.duplicate_count < 0:
+             raise ValueError(f"{ERR_INVALID_ARGUMENT}::--duplicate-count must be 0 or greater.")
+        duplicate_pages_in_pdf(args.input[0], args.output, args.pages, args.duplicate_count, args.password, options,
+                               args.large_file)
+        output_file_generated = args.output
+    elif args.operation == 'info':
+        pdf_info(args.input[0], args.output, args.password, args.pages, args.info_summary)
+        output_file_generated = args.output
+    elif args.operation == 'index':
+        stats = build_text_index(args.input[0], args.output, args.pages or 'all', args.text_workers, args.password)
+        report_stats(args, 'index_stats', stats)
+        output_file_generated = args.output
+    elif args.operation == 'search':
+        if not args.query or not args.query.strip():
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Search operation requires --query.")
+        if not args.index:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Search operation requires --index (the text index file of the input).")
+        output_file_generated = search_pdf_text(args.input[0], args.index, args.query, args.output, args.pages or 'all',
+                                                args.text_workers, args.password)
+    elif args.operation == 'split':
+        page_specs = [spec.strip() for spec in args.split_pages.split(';') if spec.strip()] if args.split_pages is not None else None
+        manifest = split_pdf(args.input[0], args.output, args.chunk_size, page_specs, args.max_bytes, args.split_workers,
+                             args.password, options)
+        # split prints its manifest (the list of written parts) instead of a single path
+        output_file_generated = json.dumps(manifest)
+    elif args.operation == 'pipeline':
+        if not args.plan:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Pipeline operation requires --plan.")
+        run_pdf_pipeline(args.input[0], args.output, args.plan, args.cache_dir, args.cache_max_mb * 1024 * 1024,
+                         args.password, options)
+        output_file_generated = args.output
+
+    if not output_file_generated:
+        raise RuntimeError(f"{ERR_UNEXPECTED}::Operation '{args.operation}' completed but no output file path was determined.")
+    if options.get('optimize'):
+        report_stats(args, 'optimize_stats', options['optimize_stats'])
+    return output_file_generated
 
+def describe_error(e):
+    """Maps an exception raised by an operation to its (exit_code, message) pair."""
+    if isinstance(e, OperationAborted):
+        return (9 if e.code == ERR_DEADLINE_EXCEEDED else 10), str(e)
+    if isinstance(e, FileNotFoundError):
+        return 4, str(e)
+    if isinstance(e, WrongPasswordError):
+        return 7, f"{ERR_DECRYPTION_FAILED}::Password error occurred: {e}"
+    if isinstance(e, PdfReadError):
+        return 5, f"{ERR_FILE_PROCESSING}::Failed to read or parse PDF: {e}"
+    if isinstance(e, ValueError):
+        if str(e).startswith(ERR_DECRYPTION_FAILED): return 7, str(e)
+        elif str(e).startswith(ERR_PAGE_RANGE): return 8, str(e)
+        else: return 2, str(e)
+    if isinstance(e, IOError):
+        return 3, str(e)
+    if isinstance(e, RuntimeError):
+        return 6, str(e)
+    return 1, f"{ERR_UNEXPECTED}::An unexpected error occurred: {type(e).__name__} - {str(e)}"
+
+def error_response(e):
+    exit_code, message = describe_error(e)
+    error_code, sep, _ = message.partition('::')
+    return {
+        'ok': False,
+        'exit_code': exit_code,
+        'error_code': error_code if sep else ERR_UNEXPECTED,
+        'message': message,
+    }
+
+def job_to_argv(job):
+    """
+    Turns a job dict into command line arguments: {"operation": "rotate",
+    "input": ["a.pdf"], "output": "b.pdf", "angle": 90} becomes
+    ['--operation=rotate', '--input', 'a.pdf', '--output=b.pdf', '--angle=90'].
+    A job may also carry a raw "argv" list instead.
+    """
+    if 'argv' in job:
+        return [str(arg) for arg in job['argv']]
+    argv = []
+    for key, value in job.items():
+        if key == 'id' or value is None or value is False:
+            continue
+        flag = '--' + key.replace('_', '-')
+        if value is True:
+            argv.append(flag)
+        elif isinstance(value, dict) or (isinstance(value, list) and any(isinstance(v, (dict, list)) for v in value)):
+            argv.append(f"{flag}={json.dumps(value)}")
+        elif isinstance(value, (list, tuple)):
+            argv.append(flag)
+            argv.extend(str(v) for v in value)
+        else:
+            argv.append(f"{flag}={value}")
+    return argv
+
+def execute_job(job):
+    """Runs one job dict and returns a JSON-serialisable result; never raises."""
+    response = {'id': job.get('id')}
+    args = None
     try:
-        for in_path in args.input:
-            if not os.path.exists(in_path):
-                raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Input file not found: {in_path}")
-            if not os.path.isfile(in_path):
-                 raise ValueError(f"{ERR_INVALID_ARGUMENT}::Input path is not a file: {in_path}")
-
-        if args.operation not in ['merge'] and len(args.input) != 1:
-            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Operation '{args.operation}' requires exactly one primary input PDF via --input (received {len(args.input)}).")
-
-        if args.operation == 'merge':
-            if len(args.input) < 2:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Merge operation requires at least two input files.")
-            merge_pdfs(args.input, args.output)
-            output_file_generated = args.output
-        elif args.operation == 'rotate':
-            if args.angle is None:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Rotate operation requires --angle.")
-            rotate_pages_in_pdf(args.input[0], args.output, args.angle, args.pages or 'all')
-            output_file_generated = args.output
-        elif args.operation == 'delete_pages':
-            if not args.pages:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Delete pages operation requires --pages to delete.")
-            delete_pages_from_pdf(args.input[0], args.output, args.pages)
-            output_file_generated = args.output
-        elif args.operation == 'extract_pages':
-            if not args.pages:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Extract pages operation requires --pages to extract.")
-            extract_specific_pages(args.input[0], args.output, args.pages)
-            output_file_generated = args.output
-        elif args.operation == 'encrypt':
-            if not args.user_password:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Encrypt operation requires --user-password.")
-            encrypt_pdf_file(args.input[0], args.output, args.user_password, args.owner_password)
-            output_file_generated = args.output
-        elif args.operation == 'decrypt':
-            if not args.password:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Decrypt operation requires --password.")
-            decrypt_pdf_file(args.input[0], args.output, args.password)
-            output_file_generated = args.output
-        elif args.operation == 'overlay':
-            if not args.overlay_pdf:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Overlay operation requires --overlay-pdf.")
-            if not os.path.exists(args.overlay_pdf):
-                 raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Overlay PDF file not found: {args.overlay_pdf}")
-            overlay_pdf_pages(args.input[0], args.overlay_pdf, args.output, args.overlay_page_number, args.pages or 'all')
-            output_file_generated = args.output
-        elif args.operation == 'extract_text':
-            output_file_generated = extract_text_from_pdf(args.input[0], args.pages or 'all', args.output)
-        elif args.operation == 'reverse_pages':
-            reverse_pdf_pages(args.input[0], args.output)
-            output_file_generated = args.output
-        elif args.operation == 'duplicate_pages':
-            if not args.pages:
-                raise ValueError(f"{ERR_INVALID_ARGUMENT}::Duplicate pages operation requires --pages to specify which pages to duplicate.")
-            if args.duplicate_count < 0:
-                 raise ValueError(f"{ERR_INVALID_ARGUMENT}::--duplicate-count must be 0 or greater.")
-            duplicate_pages_in_pdf(args.input[0], args.output, args.pages, args.duplicate_count)
-            output_file_generated = args.output
-
-        if output_file_generated:
-            print(output_file_generated, end='')
+        args = build_arg_parser(JobArgumentParser).parse_args(job_to_argv(job))
+        if args.serve or args.batch:
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Server and batch options are not allowed inside a job.")
+        if any(is_stream_spec(spec or '') for spec in (args.input or []) + [args.output, args.overlay_pdf]):
+            raise ValueError(f"{ERR_INVALID_ARGUMENT}::Jobs read and write files; '-' and fd:N streams are only available on the command line.")
+        check_required_args(args)
+        output = run_operation(args)
+        if args.operation == 'split':
+            response.update(ok=True, exit_code=0, output=args.output, manifest=json.loads(output))
         else:
-            raise RuntimeError(f"{ERR_UNEXPECTED}::Operation '{args.operation}' completed but no output file path was determined.")
-        sys.exit(0)
+            response.update(ok=True, exit_code=0, output=output)
+    except (Exception, OperationAborted) as e:
+        response.update(error_response(e))
+    if getattr(args, 'metrics_report', None):
+        response['metrics'] = args.metrics_report
+    return response
 
-    except FileNotFoundError as fnf:
-        print(str(fnf), file=sys.stderr)
-        sys.exit(4)
-    except WrongPasswordError as wpe:
-        print(f"{ERR_DECRYPTION_FAILED}::Password error occurred: {wpe}", file=sys.stderr)
-        sys.exit(7)
-    except PdfReadError as pre:
-        print(f"{ERR_FILE_PROCESSING}::Failed to read or parse PDF: {pre}", file=sys.stderr)
-        sys.exit(5)
-    except ValueError as ve:
-        print(str(ve), file=sys.stderr)
-        if str(ve).startswith(ERR_DECRYPTION_FAILED): sys.exit(7)
-        elif str(ve).startswith(ERR_PAGE_RANGE): sys.exit(8)
-        else: sys.exit(2)
-    except IOError as ioe:
-        print(str(ioe), file=sys.stderr)
-        sys.exit(3)
-    except RuntimeError as rte:
-        print(str(rte), file=sys.stderr)
-        sys.exit(6)
-    except Exception as e:
-        print(f"{ERR_UNEXPECTED}::An unexpected error occurred: {type(e).__name__} - {str(e)}", file=sys.stderr)
-        sys.exit(1)
+def _worker_lost_response(job_id, e):
+    return {'id': job_id, **error_response(RuntimeError(
+        f"{ERR_UNEXPECTED}::The worker process running this job died ({type(e).__name__}: {e}); the job was not completed."))}
+
+def _serve_stream(pool, lines, write_line):
+    """
+    Reads one JSON job per line and dispatches it to the pool. Results are
+    written as soon as they finish, so they may arrive out of order; clients
+    match them up by the job "id". A job whose worker dies gets an error
+    reply and the pool is replaced, so no job is left without an answer.
+    """
+    lock = threading.Lock()
+    pending = []
+
+    def reply(response):
+        with lock:
+            write_line(json.dumps(response))
+
+    def finished(future, job_id, replied):
+        try:
+            reply(future.result())
+        except concurrent.futures.process.BrokenProcessPool as e:
+            pool.restart(future.executor)
+            reply(_worker_lost_response(job_id, e))
+        except Exception as e:
+            reply({'id': job_id, **error_response(e)})
+        finally:
+            replied.set()
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("job must be a JSON object")
+        except ValueError as e:
+            reply({'id': None, 'ok': False, 'exit_code': 2, 'error_code': ERR_INVALID_ARGUMENT,
+                   'message': f"{ERR_INVALID_ARGUMENT}::Malformed job line: {e}"})
+            continue
+        job_id = job.get('id')
+        # futures count as done before their callbacks ran: wait for the replies
+        pending = [replied for replied in pending if not replied.is_set()]
+        replied = threading.Event()
+        pool.submit(job).add_done_callback(lambda f, job_id=job_id, replied=replied: finished(f, job_id, replied))
+        pending.append(replied)
+    for replied in pending:
+        replied.wait()
+
+def _init_worker():
+    # Ctrl+C goes to the whole process group; let the parent decide how to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class JobPool:
+    """
+    Warm worker processes running execute_job(). Unlike multiprocessing.Pool,
+    a worker that dies (OOM kill, crash in a native decoder) fails its jobs
+    with BrokenProcessPool instead of leaving them pending forever; the broken
+    executor is then replaced by a fresh one.
+    """
+
+    def __init__(self, workers, max_jobs_per_worker=0):
+        self.workers = workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                      max_tasks_per_child=self.max_jobs_per_worker or None)
+
+    def submit(self, job):
+        with self._lock:
+            try:
+                future = self._executor.submit(execute_job, job)
+            except concurrent.futures.process.BrokenProcessPool:
+                # broken by an earlier job: this one has not started yet
+                self._replace(self._executor)
+                future = self._executor.submit(execute_job, job)
+            future.executor = self._executor
+            return future
+
+    def restart(self, executor):
+        """Replaces `executor` if it is still the current one."""
+        with self._lock:
+            self._replace(executor)
+
+    def _replace(self, executor):
+        if executor is self._executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    def close(self):
+        self._executor.shutdown()
+
+def serve(workers, max_jobs_per_worker, socket_path=None):
+    """
+    Keeps a pool of warm worker processes (pypdf and Pillow already imported)
+    and feeds them jobs from stdin/stdout or from a Unix socket. Each worker
+    is replaced after max_jobs_per_worker jobs to cap leaked memory.
+    """
+    if workers < 1:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--workers must be 1 or greater.")
+    if max_jobs_per_worker < 0:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--max-jobs-per-worker must be 0 or greater.")
+    pool = JobPool(workers, max_jobs_per_worker)
+    try:
+        if socket_path is None:
+            def write_stdout(text):
+                sys.stdout.write(text + "\n")
+                sys.stdout.flush()
+            _serve_stream(pool, sys.stdin, write_stdout)
+            return
+
+        class JobStreamHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def write_socket(text):
+                    self.wfile.write(text.encode('utf-8') + b"\n")
+                    self.wfile.flush()
+                lines = (raw.decode('utf-8', errors='replace') for raw in self.rfile)
+                try:
+                    _serve_stream(pool, lines, write_socket)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, JobStreamHandler)
+        server.daemon_threads = True
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+    finally:
+        pool.close()
+
+def run_batch(jobs_path, results_path=None, workers=None, max_jobs_per_worker=0):
+    """
+    Runs every job line of `jobs_path` (same JSON objects as in server mode)
+    on a process pool and writes one NDJSON result record per job, in
+    completion order, to `results_path` or stdout ('-' or no path; 'fd:N'
+    for an inherited descriptor). A failing job only
+    produces an error record; the rest of the batch keeps going.
+    Returns (number_of_jobs, number_of_failed_jobs).
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--workers must be 1 or greater.")
+    if max_jobs_per_worker < 0:
+        raise ValueError(f"{ERR_INVALID_ARGUMENT}::--max-jobs-per-worker must be 0 or greater.")
+    try:
+        jobs_file = open(jobs_path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{ERR_FILE_PROCESSING}::Batch jobs file not found: {jobs_path}")
+    except OSError as e:
+        raise IOError(f"{ERR_IO}::Error reading batch jobs file {jobs_path}: {e}")
+    try:
+        if not results_path or results_path == STDIO_STREAM:
+            results_file = sys.stdout
+        elif is_stream_spec(results_path):
+            results_file = os.fdopen(_stream_fd(results_path, sys.stdout.fileno()), "w", encoding="utf-8", closefd=False)
+        else:
+            results_file = open(results_path, "w", encoding="utf-8")
+    except OSError as e:
+        jobs_file.close()
+        raise IOError(f"{ERR_IO}::Error opening batch results file {results_path}: {e}")
+
+    total = failed = 0
+    def record(response):
+        nonlocal failed
+        if not response['ok']:
+            failed += 1
+        results_file.write(json.dumps(response) + "\n")
+        results_file.flush()
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_jobs_per_worker or None)
+    try:
+        in_flight = {}
+        for line_number, line in enumerate(jobs_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            total += 1
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("job must be a JSON object")
+            except ValueError as e:
+                record({'id': line_number, 'line': line_number, 'ok': False, 'exit_code': 2, 'error_code': ERR_INVALID_ARGUMENT,
+                        'message': f"{ERR_INVALID_ARGUMENT}::Malformed job line: {e}"})
+                continue
+            job.setdefault('id', line_number)
+            in_flight[executor.submit(execute_job, job)] = (job['id'], line_number)
+            # keep a bounded number of jobs queued so huge batches are not read into memory at once
+            if len(in_flight) >= workers * 4:
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    record(_batch_result(future, *in_flight.pop(future)))
+        for future in concurrent.futures.as_completed(list(in_flight)):
+            record(_batch_result(future, *in_flight.pop(future)))
+    finally:
+        executor.shutdown()
+        jobs_file.close()
+        if results_file is not sys.stdout:
+            results_file.close()
+    return total, failed
+
+def _batch_result(future, job_id, line_number):
+    try:
+        response = future.result()
+    except Exception as e:  # worker process crashed
+        response = {'id': job_id, **error_response(e)}
+    response['line'] = line_number
+    return response
+
+def main():
+    parser = build_arg_parser()
+    args = parser.parse_args()
+
+    try:
+        if args.serve:
+            serve(args.workers, args.max_jobs_per_worker, args.socket)
+            sys.exit(0)
+        if args.batch:
+            total, failed = run_batch(args.batch, args.output, args.workers, args.max_jobs_per_worker)
+            print(json.dumps({'jobs': total, 'ok': total - failed, 'failed': failed}), file=sys.stderr)
+            sys.exit(0)
+        check_required_args(args)
+        # SIGTERM (e.g. a Process timeout) stops the run at the next page instead of mid-write
+        signal.signal(signal.SIGTERM, _request_cancel)
+        output_file_generated = run_operation(args)
+        print(output_file_generated, end='')
+        sys.exit(0)
+    except (Exception, OperationAborted) as e:
+        exit_code, message = describe_error(e)
+        print(message, file=sys.stderr)
+        sys.exit(exit_code)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,806 @@
+import io
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf  # noqa: E402
+
+PDF_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pdf.py')
+
+
+def write_blank_pdf(path, pages):
+    writer = pdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    with open(path, 'wb') as f_out:
+        writer.write(f_out)
+    return str(path)
+
+
+def write_numbered_pdf(path, pages, password=None):
+    """Page i (0-based) is 100 + i points wide, so pages can be told apart after reordering."""
+    writer = pdf.PdfWriter()
+    for i in range(pages):
+        writer.add_blank_page(width=100 + i, height=200)
+    if password:
+        writer.encrypt(password)
+    with open(path, 'wb') as f_out:
+        writer.write(f_out)
+    return str(path)
+
+
+def page_numbers(path, password=None):
+    """1-based original page number of every page of `path` (see write_numbered_pdf)."""
+    reader = pdf.PdfReader(str(path))
+    if password:
+        reader.decrypt(password)
+    return [int(page.mediabox.width) - 99 for page in reader.pages]
+
+
+def write_text_pdf(path, texts, password=None):
+    """One page per string of `texts`, drawn in Helvetica."""
+    writer = pdf.PdfWriter()
+    font = writer._add_object(pdf.DictionaryObject({
+        pdf.NameObject('/Type'): pdf.NameObject('/Font'),
+        pdf.NameObject('/Subtype'): pdf.NameObject('/Type1'),
+        pdf.NameObject('/BaseFont'): pdf.NameObject('/Helvetica'),
+    }))
+    for text in texts:
+        page = writer.add_blank_page(width=600, height=200)
+        content = pdf.DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 100 Td ({text}) Tj ET".encode())
+        page[pdf.NameObject('/Contents')] = writer._add_object(content)
+        page[pdf.NameObject('/Resources')] = pdf.DictionaryObject({
+            pdf.NameObject('/Font'): pdf.DictionaryObject({pdf.NameObject('/F1'): font})})
+    if password:
+        writer.encrypt(password)
+    with open(path, 'wb') as f_out:
+        writer.write(f_out)
+    return str(path)
+
+
+def run_cli(*args, **kwargs):
+    return subprocess.run([sys.executable, PDF_SCRIPT, *map(str, args)], capture_output=True, text=True, timeout=120, **kwargs)
+
+
+def write_linked_pdf(path, pages):
+    """Every page links to the first one, the first page to the second."""
+    writer = pdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    for i, page in enumerate(writer.pages):
+        link = pdf.DictionaryObject({
+            pdf.NameObject('/Type'): pdf.NameObject('/Annot'),
+            pdf.NameObject('/Subtype'): pdf.NameObject('/Link'),
+            pdf.NameObject('/Rect'): pdf.ArrayObject([pdf.NumberObject(0), pdf.NumberObject(0), pdf.NumberObject(50), pdf.NumberObject(50)]),
+            pdf.NameObject('/Dest'): pdf.ArrayObject([writer.pages[1 if i == 0 else 0].indirect_reference, pdf.NameObject('/Fit')]),
+        })
+        page[pdf.NameObject('/Annots')] = pdf.ArrayObject([writer._add_object(link)])
+    with open(path, 'wb') as f_out:
+        writer.write(f_out)
+    return str(path)
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('1-3', [0, 1, 2]),
+    ('1 - 3', [0, 1, 2]),
+    ('2- 4', [1, 2, 3]),
+    (' 5 -', [4, 5]),
+    ('1, 3 -4', [0, 2, 3]),
+    ('1-last : 2', [0, 2, 4]),
+])
+def test_parse_page_spec_accepts_whitespace_around_separators(spec, expected):
+    assert list(pdf.parse_page_spec(spec, 6)) == expected
+
+
+def test_page_selection_len_counts_overlapping_stepped_ranges():
+    ranges = [range(0, 50, 2), range(0, 50, 3), range(10, 20), range(5, 45, 5)]
+    expected = set().union(*ranges)
+    assert len(pdf.PageSelection(ranges)) == len(expected)
+    many = [range(k, 100, k + 2) for k in range(pdf.PageSelection.MAX_INCLUSION_EXCLUSION + 2)]
+    assert len(pdf.PageSelection(many)) == len(set().union(*many))
+
+
+def test_page_selection_len_of_huge_stepped_range():
+    assert len(pdf.parse_page_spec('1-last:3,2-last:6', 10 ** 9)) == len(range(0, 10 ** 9, 3)) + len(range(1, 10 ** 9, 6))
+
+
+def test_serve_extract_text_with_text_workers(tmp_path):
+    source = write_blank_pdf(tmp_path / 'in.pdf', pdf.TEXT_CHUNK_PAGES * 3)
+    job = {'id': 1, 'operation': 'extract_text', 'input': [source], 'output': str(tmp_path / 'out.txt'), 'text_workers': 2}
+    result = subprocess.run([sys.executable, PDF_SCRIPT, '--serve', '--workers', '1'], input=json.dumps(job) + "\n",
+                            capture_output=True, text=True, timeout=120)
+    response = json.loads(result.stdout.splitlines()[-1])
+    assert response['ok'], response
+
+
+def test_parallel_ndjson_text_matches_sequential(tmp_path):
+    texts = [f"page {i} " + "word " * (i % 7) for i in range(pdf.TEXT_CHUNK_PAGES * 3 + 5)]
+    source = write_text_pdf(tmp_path / 'in.pdf', texts)
+    outputs = []
+    for workers in (1, 3):
+        output = tmp_path / f'out{workers}.ndjson'
+        result = run_cli('--operation', 'extract_text', '--input', source, '--output', output,
+                         '--text-format', 'ndjson', '--text-workers', workers)
+        assert result.returncode == 0, result.stderr
+        outputs.append(output.read_text())
+    assert outputs[0] == outputs[1]
+    records = [json.loads(line) for line in outputs[1].splitlines()]
+    assert [record['page'] for record in records] == list(range(1, len(texts) + 1))
+    assert records[9]['text'].startswith('page 9')
+    assert all(a['char_end'] == b['char_start'] for a, b in zip(records, records[1:]))
+
+
+def test_merge_repeat_detection_hashes_only_same_size_files(tmp_path, monkeypatch):
+    first = write_blank_pdf(tmp_path / 'first.pdf', 1)
+    second = write_blank_pdf(tmp_path / 'second.pdf', 3)
+    copy = tmp_path / 'copy.pdf'
+    copy.write_bytes(open(first, 'rb').read())
+    hashed = []
+    monkeypatch.setattr(pdf, '_file_sha256', lambda path: hashed.append(path) or open(path, 'rb').read())
+
+    identities = pdf._input_identities([first, second, first])
+    assert hashed == []
+    assert identities[0] == identities[2] != identities[1]
+
+    identities = pdf._input_identities([first, second, str(copy)])
+    assert sorted(hashed) == sorted([first, str(copy)])
+    assert identities[0] == identities[2] != identities[1]
+
+
+def streaming_merge(tmp_path, *inputs, budget_mb=4096):
+    output = tmp_path / 'merged.pdf'
+    result = run_cli('--operation', 'merge', '--input', *inputs, '--output', output, '--memory-budget-mb', budget_mb)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stderr.splitlines()[-1])['merge_stats'], pdf.PdfReader(str(output))
+
+
+def test_streaming_merge_stores_identical_streams_once(tmp_path):
+    first = write_text_pdf(tmp_path / 'a.pdf', ['shared page', 'only in a'])
+    second = write_text_pdf(tmp_path / 'b.pdf', ['shared page', 'only in b', 'also in b'])
+    stats, reader = streaming_merge(tmp_path, first, second)
+    assert (stats['pages'], stats['deduplicated_streams'], stats['repeated_inputs']) == (5, 1, 0)
+    texts = [page.extract_text() for page in reader.pages]
+    assert texts == ['shared page', 'only in a', 'shared page', 'only in b', 'also in b']
+    assert reader.pages[0].raw_get('/Contents').idnum == reader.pages[2].raw_get('/Contents').idnum
+    assert stats['rss_bytes'] <= stats['memory_budget_bytes']
+
+
+def test_streaming_merge_reuses_the_memo_of_a_repeated_input(tmp_path):
+    first = write_text_pdf(tmp_path / 'a.pdf', ['first', 'second'])
+    second = write_text_pdf(tmp_path / 'b.pdf', ['third'])
+    once, _ = streaming_merge(tmp_path, first, second)
+    stats, reader = streaming_merge(tmp_path, first, second, first)
+    assert (stats['pages'], stats['repeated_inputs'], stats['deduplicated_streams']) == (5, 1, 0)
+    # the repeat only adds its two page dictionaries
+    assert stats['objects'] == once['objects'] + 2
+    assert [page.extract_text() for page in reader.pages] == ['first', 'second', 'third', 'first', 'second']
+    assert reader.pages[0].raw_get('/Contents').idnum == reader.pages[3].raw_get('/Contents').idnum
+
+
+def test_streaming_merge_fails_over_memory_budget(tmp_path):
+    first, second = write_blank_pdf(tmp_path / 'a.pdf', 2), write_blank_pdf(tmp_path / 'b.pdf', 2)
+    output = tmp_path / 'merged.pdf'
+    result = run_cli('--operation', 'merge', '--input', first, second, '--output', output, '--memory-budget-mb', 1)
+    assert result.returncode == 2, result.stderr
+    assert result.stderr.startswith('FILE_PROCESSING_ERROR::Merge exceeded the memory budget of 1 MB')
+    assert not output.exists()
+
+
+def test_overlay_png_streamed_through_stdin(tmp_path):
+    source = write_blank_pdf(tmp_path / 'in.pdf', 2)
+    png = io.BytesIO()
+    pdf.Image.new('RGBA', (20, 10), (255, 0, 0, 128)).save(png, format='PNG')
+    output = tmp_path / 'out.pdf'
+    result = subprocess.run([sys.executable, PDF_SCRIPT, '--operation', 'overlay', '--input', source,
+                             '--overlay-pdf', '-', '--output', str(output)],
+                            input=png.getvalue(), capture_output=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    for page in pdf.PdfReader(str(output)).pages:
+        assert page.images, "overlay image missing"
+
+
+def test_overlay_rejects_encrypted_overlay_pdf(tmp_path):
+    source = write_blank_pdf(tmp_path / 'in.pdf', 2)
+    overlay = write_numbered_pdf(tmp_path / 'overlay.pdf', 1, password='pw')
+    result = run_cli('--operation', 'overlay', '--input', source, '--overlay-pdf', overlay, '--output', tmp_path / 'out.pdf')
+    assert result.returncode == 7, result.stderr
+    assert result.stderr.startswith('DECRYPTION_FAILED::Overlay PDF ')
+
+
+def test_overlay_copies_shared_resources_once(tmp_path):
+    writer = pdf.PdfWriter()
+    for _ in range(4):
+        writer.add_blank_page(width=200, height=200)
+    shared = writer._add_object(pdf.DictionaryObject({pdf.NameObject('/ProcSet'): pdf.ArrayObject([pdf.NameObject('/PDF')])}))
+    for page in writer.pages:
+        page[pdf.NameObject('/Resources')] = shared
+    source = tmp_path / 'in.pdf'
+    with open(source, 'wb') as f_out:
+        writer.write(f_out)
+    overlay = write_blank_pdf(tmp_path / 'overlay.pdf', 1)
+    output = tmp_path / 'out.pdf'
+    result = run_cli('--operation', 'overlay', '--input', source, '--overlay-pdf', overlay, '--output', output)
+    assert result.returncode == 0, result.stderr
+    pages = pdf.PdfReader(str(output)).pages
+    resources = {page.raw_get('/Resources').idnum for page in pages}
+    assert len(resources) == 1
+    for page in pages:
+        assert '/PdfOverlay0' in page['/Resources']['/XObject']
+        assert page['/Resources']['/ProcSet'] == ['/PDF']
+
+
+def test_image_overlay_cache_hit_and_invalidation(tmp_path, monkeypatch):
+    logo = tmp_path / 'logo.png'
+    cache_dir = str(tmp_path / 'cache')
+    conversions = []
+    convert = pdf._image_pdf_bytes
+    monkeypatch.setattr(pdf, '_image_pdf_bytes', lambda *a: conversions.append(a) or convert(*a))
+
+    def overlay_colour():
+        reader = pdf._make_pdf_reader(str(logo), cache_dir)
+        pixel = reader.pages[0].images[0].image.convert('RGB').getpixel((0, 0))
+        return ('red', 'green', 'blue')[pixel.index(max(pixel))]
+
+    pdf.Image.new('RGB', (8, 8), (255, 0, 0)).save(logo)
+    assert overlay_colour() == 'red'
+    assert overlay_colour() == 'red'
+    assert len(conversions) == 1
+
+    # same name and size, new content: the cached conversion must not be reused
+    pdf.Image.new('RGB', (8, 8), (0, 0, 255)).save(logo)
+    assert overlay_colour() == 'blue'
+    assert len(conversions) == 2
+    assert overlay_colour() == 'blue'
+    assert len(conversions) == 2
+
+
+def test_result_cache_hit_repeats_stats(tmp_path):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 3)
+    cache_dir = tmp_path / 'cache'
+    runs = []
+    for n in range(2):
+        output = tmp_path / f'out{n}.pdf'
+        result = run_cli('--operation', 'rotate', '--angle', 90, '--input', source, '--output', output, '--optimize', 1,
+                         '--cache-results', '--cache-dir', cache_dir)
+        assert result.returncode == 0, result.stderr
+        runs.append((output.read_bytes(), [json.loads(line) for line in result.stderr.splitlines()]))
+    assert runs[0] == runs[1]
+    assert 'optimize_stats' in runs[0][1][0]
+    # the second run was served from the cache: one output and one stats entry
+    entries = sorted(os.path.splitext(name)[1] for _, _, names in os.walk(cache_dir) for name in names)
+    assert entries == ['.key', '.pdf', '.stats']
+
+
+def test_result_cache_key_password_digest_depends_on_cache_secret(tmp_path):
+    args = pdf.build_arg_parser().parse_args(['--operation', 'decrypt', '--input', write_numbered_pdf(tmp_path / 'in.pdf', 1),
+                                              '--output', 'out.pdf', '--password', 'hunter2'])
+    first, second = pdf.cache_secret(str(tmp_path / 'a')), pdf.cache_secret(str(tmp_path / 'b'))
+    assert first != second and len(first) == 32
+    assert pdf.cache_secret(str(tmp_path / 'a')) == first
+    assert pdf.result_cache_key(args, first) == pdf.result_cache_key(args, first) != pdf.result_cache_key(args, second)
+    assert os.stat(tmp_path / 'a' / pdf.CACHE_SECRET_NAME).st_mode & 0o077 == 0
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    pdf.cache_secret(cache_dir)
+    for age, key in enumerate(['aa1', 'bb2']):
+        os.utime(pdf.cache_store(cache_dir, key, '.bin', b'x' * 100), (1000 + age, 1000 + age))
+    assert pdf.cache_lookup(cache_dir, 'aa1', '.bin')  # now the most recently used
+    pdf.cache_store(cache_dir, 'cc3', '.bin', b'x' * 100, max_bytes=250)
+    assert pdf.cache_lookup(cache_dir, 'aa1', '.bin') and pdf.cache_lookup(cache_dir, 'cc3', '.bin')
+    assert pdf.cache_lookup(cache_dir, 'bb2', '.bin') is None
+
+    for n in range(10):
+        pdf.cache_store(cache_dir, f'{n}{n}key', '.bin', b'x' * 100, max_bytes=450)
+    sizes = [os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(cache_dir)
+             for name in names if name != pdf.CACHE_SECRET_NAME]
+    assert sum(sizes) <= 450 and len(sizes) == 4
+    assert os.path.exists(os.path.join(cache_dir, pdf.CACHE_SECRET_NAME))
+
+
+def test_info_summary_of_encrypted_file(tmp_path):
+    source = tmp_path / 'in.pdf'
+    write_numbered_pdf(source, 4, password='pw')
+
+    def info(*args):
+        output = tmp_path / 'info.json'
+        result = run_cli('--operation', 'info', '--input', source, '--output', output, *args)
+        assert result.returncode == 0, result.stderr
+        return json.loads(output.read_text())
+
+    locked = info('--info-summary')
+    assert (locked['encrypted'], locked['decrypted'], locked['page_count']) == (True, False, None)
+    assert locked['encryption'] == {'filter': 'Standard', 'version': 2, 'revision': 3, 'algorithm': 'RC4-128'}
+    assert locked['file_size'] == source.stat().st_size
+
+    summary = info('--info-summary', '--password', 'pw')
+    assert (summary['decrypted'], summary['page_count'], summary['has_text']) == (True, 4, None)
+    assert 'pages' not in summary
+
+    full = info('--password', 'pw')
+    assert [page['width'] for page in full['pages']] == [100, 101, 102, 103]
+    assert {key: full[key] for key in summary} == dict(summary, has_text=False)
+
+
+def split_parts(tmp_path, source, *args):
+    result = run_cli('--operation', 'split', '--input', source, '--output', tmp_path / 'parts', *args)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)['parts']
+
+
+@pytest.mark.parametrize('args, ranges', [
+    (('--chunk-size', 3), ['1-3', '4-6', '7']),
+    (('--chunk-size', 7), ['1-7']),
+    (('--split-pages', '1-2; 5-last ;3'), ['1-2', '5-7', '3']),
+])
+def test_split_part_boundaries(tmp_path, args, ranges):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 7)
+    parts = split_parts(tmp_path, source, *args)
+    assert [part['pages'] for part in parts] == ranges
+    for n, part in enumerate(parts, 1):
+        assert os.path.basename(part['path']) == f'in_part{n:03d}.pdf'
+        assert page_numbers(part['path']) == [i + 1 for i in pdf.parse_page_spec(part['pages'], 7)]
+        assert (part['page_count'], part['bytes']) == (len(page_numbers(part['path'])), os.path.getsize(part['path']))
+
+
+def test_split_by_size_counts_shared_objects_once_per_part(tmp_path):
+    # every page has 20 kB of content of its own and draws one shared 30 kB form
+    writer = pdf.PdfWriter()
+    form = pdf.DecodedStreamObject()
+    form.set_data(b"%" + os.urandom(15000).hex().encode() + b"\n")
+    form.update({pdf.NameObject('/Type'): pdf.NameObject('/XObject'), pdf.NameObject('/Subtype'): pdf.NameObject('/Form'),
+                 pdf.NameObject('/BBox'): pdf.ArrayObject([pdf.NumberObject(0)] * 4)})
+    form = writer._add_object(form)
+    for i in range(7):
+        page = writer.add_blank_page(width=100 + i, height=200)
+        content = pdf.DecodedStreamObject()
+        content.set_data(b"%" + os.urandom(10000).hex().encode() + b"\n/Shared Do\n")
+        page[pdf.NameObject('/Contents')] = writer._add_object(content)
+        page[pdf.NameObject('/Resources')] = pdf.DictionaryObject({
+            pdf.NameObject('/XObject'): pdf.DictionaryObject({pdf.NameObject('/Shared'): form})})
+    source = tmp_path / 'in.pdf'
+    with open(source, 'wb') as f_out:
+        writer.write(f_out)
+
+    parts = split_parts(tmp_path, source, '--max-bytes', 75000)
+    assert [part['pages'] for part in parts] == ['1-2', '3-4', '5-6', '7']
+    assert all(part['bytes'] <= 75000 for part in parts)
+    assert [n for part in parts for n in page_numbers(part['path'])] == list(range(1, 8))
+
+
+def test_user_password_encrypts_other_operations_only_with_reencrypt(tmp_path):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 3)
+    output = tmp_path / 'out.pdf'
+    result = run_cli('--operation', 'reverse_pages', '--input', source, '--output', output, '--user-password', 'secret')
+    assert result.returncode == 2, result.stderr
+    assert result.stderr.startswith('INVALID_ARGUMENT::--user-password')
+    assert not output.exists()
+
+    result = run_cli('--operation', 'reverse_pages', '--input', source, '--output', output, '--user-password', 'secret', '--reencrypt')
+    assert result.returncode == 0, result.stderr
+    assert pdf.PdfReader(str(output)).is_encrypted
+    assert page_numbers(output, 'secret') == [3, 2, 1]
+
+
+def incremental_rotate(source, output, angle, pages, *args):
+    result = run_cli('--operation', 'rotate', '--input', source, '--output', output, '--angle', angle, '--pages', pages,
+                     '--incremental', *args)
+    assert result.returncode == 0, result.stderr
+    assert output.read_bytes().startswith(source.read_bytes())
+
+
+def rotations(path, password=None):
+    reader = pdf.PdfReader(str(path), strict=True)
+    if password:
+        reader.decrypt(password)
+    return [page.get('/Rotate', 0) for page in reader.pages]
+
+
+@pytest.mark.parametrize('kind', ['plain', 'object_streams', 'encrypted'])
+def test_incremental_rotate_appends_to_the_original(tmp_path, kind):
+    source = tmp_path / 'in.pdf'
+    password = 'pw' if kind == 'encrypted' else None
+    write_numbered_pdf(source, 4, password)
+    args = ('--password', password) if password else ()
+    if kind == 'object_streams':
+        packed = tmp_path / 'packed.pdf'
+        result = run_cli('--operation', 'extract_pages', '--input', source, '--pages', 'all', '--output', packed, '--optimize', 2)
+        assert result.returncode == 0, result.stderr
+        assert pdf.PdfReader(str(packed)).xref_objStm
+        source = packed
+
+    first = tmp_path / 'first.pdf'
+    incremental_rotate(source, first, 90, '2', *args)
+    assert rotations(first, password) == [0, 90, 0, 0]
+    assert page_numbers(first, password) == [1, 2, 3, 4]
+
+    # a second update on top of the first chains to both earlier xref sections
+    second = tmp_path / 'second.pdf'
+    incremental_rotate(first, second, 180, '2-3', *args)
+    assert rotations(second, password) == [0, 270, 180, 0]
+    assert page_numbers(second, password) == [1, 2, 3, 4]
+
+
+def test_write_incremental_update_keeps_original_bytes(tmp_path):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 3)
+    reader = pdf.PdfReader(source)
+    page = reader.pages[1]
+    page[pdf.NameObject('/Rotate')] = pdf.NumberObject(90)
+    output = tmp_path / 'out.pdf'
+    with open(source, 'rb') as f_in:
+        pdf.write_incremental_update(reader, f_in, str(output), [(page.indirect_reference, page)])
+    original = open(source, 'rb').read()
+    updated = output.read_bytes()
+    assert updated.startswith(original)
+    # only the changed page object, an xref section and a trailer are appended
+    assert updated[len(original):].count(b' obj\n') == 1
+    assert rotations(output) == [0, 90, 0]
+
+
+def test_optimize_merges_font_chains_and_keeps_unshareable_objects(tmp_path):
+    writer = pdf.PdfWriter()
+    fonts = []
+    for _ in range(2):
+        font_file = pdf.DecodedStreamObject()
+        font_file.set_data(b"font program " * 200)
+        descriptor = writer._add_object(pdf.DictionaryObject({
+            pdf.NameObject('/Type'): pdf.NameObject('/FontDescriptor'),
+            pdf.NameObject('/FontFile'): writer._add_object(font_file),
+        }))
+        fonts.append(writer._add_object(pdf.DictionaryObject({
+            pdf.NameObject('/Type'): pdf.NameObject('/Font'),
+            pdf.NameObject('/FontDescriptor'): descriptor,
+        })))
+    groups = [writer._add_object(pdf.DictionaryObject({pdf.NameObject('/Type'): pdf.NameObject('/OCG'),
+                                                       pdf.NameObject('/Name'): pdf.ByteStringObject(b'layer')}))
+              for _ in range(2)]
+    for font, group in zip(fonts, groups):
+        page = writer.add_blank_page(width=200, height=200)
+        page[pdf.NameObject('/Resources')] = pdf.DictionaryObject({
+            pdf.NameObject('/Font'): pdf.DictionaryObject({pdf.NameObject('/F1'): font}),
+            pdf.NameObject('/Properties'): pdf.DictionaryObject({pdf.NameObject('/L'): group}),
+        })
+    orphan = writer._add_object(pdf.DictionaryObject({pdf.NameObject('/Unused'): pdf.NumberObject(1)}))
+
+    stats = pdf.optimize_pdf_writer(writer)
+    # font, descriptor and font file of the second page all merge in one pass
+    assert stats == {'compressed_streams': 2, 'deduplicated_objects': 3, 'removed_objects': 1}
+    assert writer._objects[orphan.idnum - 1] is None
+    resources = [page['/Resources'] for page in writer.pages]
+    assert resources[0]['/Font'].raw_get('/F1') == resources[1]['/Font'].raw_get('/F1') == fonts[0]
+    assert [r['/Properties'].raw_get('/L').idnum for r in resources] == [group.idnum for group in groups]
+
+
+@pytest.mark.parametrize('level', [1, 2])
+def test_optimize_reports_sizes_and_writes_object_streams(tmp_path, level):
+    first = write_text_pdf(tmp_path / 'a.pdf', ['first page', 'second page'])
+    second = write_text_pdf(tmp_path / 'b.pdf', ['third page'])
+    output = tmp_path / 'out.pdf'
+    result = run_cli('--operation', 'merge', '--input', first, second, '--output', output, '--optimize', level,
+                     '--metrics', tmp_path / 'metrics.json')
+    assert result.returncode == 0, result.stderr
+    stats, = next(json.loads(line)['optimize_stats'] for line in result.stderr.splitlines() if 'optimize_stats' in line)
+    assert stats['input_bytes'] == os.path.getsize(first) + os.path.getsize(second)
+    assert stats['bytes_after'] == output.stat().st_size < stats['bytes_before']
+    assert stats['deduplicated_objects'] >= 1  # the second input's font
+    assert stats['object_streams'] == (level == 2)
+    reader = pdf.PdfReader(str(output))
+    assert bool(reader.xref_objStm) == (level == 2)
+    assert [page.extract_text() for page in reader.pages] == ['first page', 'second page', 'third page']
+
+
+def search(source, index, query, *args):
+    output = index.parent / 'matches.json'
+    result = run_cli('--operation', 'search', '--input', source, '--index', index, '--query', query, '--output', output, *args)
+    assert result.returncode == 0, result.stderr
+    return json.loads(output.read_text())
+
+
+def test_index_then_search_ranks_pages_by_hits(tmp_path):
+    source = write_text_pdf(tmp_path / 'in.pdf', ['Apple banana cherry', 'banana banana split', 'nothing here',
+                                                 'cherry apple pie BANANA'])
+    index = tmp_path / 'in.idx'
+    result = run_cli('--operation', 'index', '--input', source, '--output', index)
+    assert result.returncode == 0, result.stderr
+    stats = json.loads(result.stderr.splitlines()[-1])['index_stats']
+    assert (stats['page_count'], stats['pages_indexed'], stats['pages_extracted']) == (4, 4, 4)
+
+    found = search(source, index, 'banana')
+    assert found['pages_extracted'] == 0  # answered from the index
+    assert [(match['page'], match['hits']) for match in found['matches']] == [(1, 1), (2, 2), (4, 1)]
+    assert found['matches'][1]['snippets'] == ['banana banana split']
+
+    assert [match['page'] for match in search(source, index, 'APPLE banana')['matches']] == [1, 4]
+    assert [match['page'] for match in search(source, index, '"apple pie"')['matches']] == [4]
+    assert [match['page'] for match in search(source, index, 'banana', '--pages', '2-3')['matches']] == [2]
+    assert search(source, index, 'durian')['matches'] == []
+
+
+def test_search_reindexes_a_changed_pdf(tmp_path):
+    source = write_text_pdf(tmp_path / 'in.pdf', ['old words', 'more old words'])
+    index = tmp_path / 'in.idx'
+    assert [match['page'] for match in search(source, index, 'old')['matches']] == [1, 2]
+    write_text_pdf(source, ['new words', 'old words', 'other'])
+    found = search(source, index, 'old')
+    assert (found['page_count'], found['pages_extracted']) == (3, 3)
+    assert [match['page'] for match in found['matches']] == [2]
+
+
+class BitReader:
+    """Reads the big-endian bit fields of a hint table."""
+
+    def __init__(self, data):
+        self.data, self.position = data, 0
+
+    def read(self, bits):
+        value = 0
+        for _ in range(bits):
+            byte = self.data[self.position // 8]
+            value = (value << 1) | ((byte >> (7 - self.position % 8)) & 1)
+            self.position += 1
+        return value
+
+    def align(self):
+        self.position = (self.position + 7) // 8 * 8
+
+
+@pytest.mark.parametrize('password', [None, 'pw'])
+def test_linearize_writes_valid_hint_tables(tmp_path, password):
+    texts = [f"page {i}" for i in range(6)]
+    source = write_text_pdf(tmp_path / 'in.pdf', texts, password)
+    output = tmp_path / 'out.pdf'
+    args = ('--password', password, '--reencrypt') if password else ()
+    result = run_cli('--operation', 'extract_pages', '--pages', 'all', '--input', source, '--output', output, '--linearize', *args)
+    assert result.returncode == 0, result.stderr
+
+    data = output.read_bytes()
+    reader = pdf.PdfReader(str(output), strict=True)
+    if password:
+        assert reader.is_encrypted and reader.decrypt(password)
+    assert [page.extract_text() for page in reader.pages] == texts
+
+    match = re.search(rb"<< /Linearized 1 /L (\d+) /H \[ (\d+) (\d+) \] /O (\d+) /E (\d+) /N (\d+) /T (\d+) >>", data[:1024])
+    assert match, "linearization dictionary missing from the start of the file"
+    length, hint_offset, hint_length, first_page, first_page_end, page_count, _ = map(int, match.groups())
+    assert (length, page_count) == (len(data), len(texts))
+
+    offsets = reader.xref[0]
+    main_xref = int(re.search(rb"/Prev (\d+)", data[data.index(b"trailer"):]).group(1))
+    ends = sorted(offsets.values()) + [main_xref]
+
+    def object_end(number):
+        return ends[ends.index(offsets[number]) + 1]
+
+    def without_hints(offset):
+        return offset - hint_length if offset >= hint_offset else offset
+
+    hint_number = int(re.match(rb"(\d+) 0 obj", data[hint_offset:]).group(1))
+    bits = BitReader(reader.get_object(hint_number).get_data())
+    (min_objects, first_page_offset, object_bits, min_length, length_bits, _, _, _, _,
+     _, _, _, _) = [bits.read(width) for width in (32, 32, 16, 32, 16, 32, 16, 32, 16, 16, 16, 16, 16)]
+    object_counts = [min_objects + bits.read(object_bits) for _ in range(page_count)]
+    bits.align()
+    page_lengths = [min_length + bits.read(length_bits) for _ in range(page_count)]
+
+    assert first_page_offset == without_hints(offsets[first_page])
+    # the first page's objects start at /O, the other pages' objects are numbered from 1 in page order
+    starts = [first_page] + list(itertools.accumulate(object_counts[1:-1], initial=1))
+    assert [page.indirect_reference.idnum for page in reader.pages] == starts
+    for start, count, page_length in zip(starts, object_counts, page_lengths):
+        assert object_end(start + count - 1) - offsets[start] == page_length
+    assert object_end(first_page + object_counts[0] - 1) <= first_page_end
+
+
+def test_large_file_extract_does_not_copy_linked_pages(tmp_path):
+    source = write_linked_pdf(tmp_path / 'in.pdf', 300)
+    output = tmp_path / 'out.pdf'
+    result = subprocess.run([sys.executable, PDF_SCRIPT, '--operation', 'extract_pages', '--input', source,
+                             '--pages', '5', '--output', str(output), '--large-file'], capture_output=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    reader = pdf.PdfReader(str(output))
+    assert len(reader.pages) == 1
+    # catalog, page tree, page, link annotation and the nulled link target
+    assert reader.trailer['/Size'] <= 8
+    assert isinstance(reader.pages[0]['/Annots'][0].get_object()['/Dest'][0].get_object(), pdf.NullObject)
+
+
+def test_large_file_keeps_links_between_selected_pages(tmp_path):
+    source = write_linked_pdf(tmp_path / 'in.pdf', 10)
+    output = tmp_path / 'out.pdf'
+    result = subprocess.run([sys.executable, PDF_SCRIPT, '--operation', 'extract_pages', '--input', source,
+                             '--pages', '1-2', '--output', str(output), '--large-file'], capture_output=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    reader = pdf.PdfReader(str(output))
+    first, second = reader.pages
+    # page 1 links forward to page 2, which is written after it
+    assert first['/Annots'][0].get_object()['/Dest'][0].idnum == second.indirect_reference.idnum
+    assert second['/Annots'][0].get_object()['/Dest'][0].idnum == first.indirect_reference.idnum
+    assert reader.trailer['/Size'] <= 8
+
+
+@pytest.fixture
+def mappings(monkeypatch):
+    """Every mapping open_mapped_pdf creates."""
+    created = []
+    real_mmap = pdf.mmap.mmap
+    monkeypatch.setattr(pdf.mmap, 'mmap', lambda *args, **kwargs: created.append(real_mmap(*args, **kwargs)) or created[-1])
+    return created
+
+
+def test_open_mapped_pdf_closes_the_mapping(tmp_path, mappings):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 3)
+    with pdf.open_mapped_pdf(source) as reader:
+        assert len(reader.pages) == 3
+        # a buffer only reachable through a reference cycle is collected on close
+        cycle = [memoryview(mappings[0])]
+        cycle.append(cycle)
+        del cycle
+    assert mappings[0].closed and reader.stream is None
+
+    with pytest.raises(ValueError):
+        with pdf.open_mapped_pdf(source) as reader:
+            raise ValueError("failed job")
+    assert mappings[1].closed
+
+
+def test_open_mapped_pdf_reports_a_leaked_buffer(tmp_path, mappings):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 1)
+    with pytest.raises(BufferError):
+        with pdf.open_mapped_pdf(source):
+            view = memoryview(mappings[0])
+    view.release()
+    mappings[0].close()
+
+
+def serve_jobs(jobs, *args):
+    lines = "".join((job if isinstance(job, str) else json.dumps(job)) + "\n" for job in jobs)
+    result = subprocess.run([sys.executable, PDF_SCRIPT, '--serve', '--workers', '2', *args], input=lines,
+                            capture_output=True, text=True, timeout=120)
+    return {response['id']: response for response in map(json.loads, result.stdout.splitlines())}
+
+
+def test_serve_replies_per_job_errors(tmp_path):
+    source = write_blank_pdf(tmp_path / 'in.pdf', 3)
+    responses = serve_jobs([
+        {'id': 'ok', 'operation': 'rotate', 'input': [source], 'output': str(tmp_path / 'out.pdf'), 'angle': 90},
+        {'id': 'missing', 'operation': 'rotate', 'input': [str(tmp_path / 'nope.pdf')], 'output': str(tmp_path / 'x.pdf'), 'angle': 90},
+        {'id': 'range', 'operation': 'delete_pages', 'input': [source], 'output': str(tmp_path / 'y.pdf'), 'pages': '7'},
+        'not json',
+    ])
+    assert responses['ok']['ok'] and responses['ok']['exit_code'] == 0
+    assert (responses['missing']['exit_code'], responses['missing']['error_code']) == (4, pdf.ERR_FILE_PROCESSING)
+    assert (responses['range']['exit_code'], responses['range']['error_code']) == (8, pdf.ERR_PAGE_RANGE)
+    assert responses[None]['error_code'] == pdf.ERR_INVALID_ARGUMENT
+
+
+def test_serve_socket_mode(tmp_path):
+    import socket
+    import time
+    source = write_blank_pdf(tmp_path / 'in.pdf', 2)
+    socket_path = str(tmp_path / 'pdf.sock')
+    server = subprocess.Popen([sys.executable, PDF_SCRIPT, '--serve', '--workers', '1', '--socket', socket_path])
+    try:
+        deadline = time.monotonic() + 30
+        while not os.path.exists(socket_path):
+            assert time.monotonic() < deadline and server.poll() is None, "server did not start"
+            time.sleep(0.05)
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(socket_path)
+            jobs = [{'id': 1, 'operation': 'reverse_pages', 'input': [source], 'output': str(tmp_path / 'out.pdf')},
+                    {'id': 2, 'operation': 'reverse_pages', 'input': [str(tmp_path / 'nope.pdf')], 'output': str(tmp_path / 'x.pdf')}]
+            client.sendall("".join(json.dumps(job) + "\n" for job in jobs).encode())
+            client.shutdown(socket.SHUT_WR)
+            responses = {r['id']: r for r in map(json.loads, client.makefile().read().splitlines())}
+        assert responses[1]['ok'] and len(pdf.PdfReader(str(tmp_path / 'out.pdf')).pages) == 2
+        assert responses[2]['error_code'] == pdf.ERR_FILE_PROCESSING
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    assert not os.path.exists(socket_path)
+
+
+def test_serve_replies_when_worker_dies(tmp_path):
+    import signal
+    import time
+    source = write_blank_pdf(tmp_path / 'in.pdf', 1)
+    job = {'id': 1, 'operation': 'reverse_pages', 'input': [source], 'output': str(tmp_path / 'out.pdf')}
+    pool = pdf.JobPool(1)
+    try:
+        assert pool.submit(job).result(timeout=60)['ok']
+        executor = pool._executor
+        for pid in list(executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        while not executor._broken:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        # a job on the broken pool gets an error reply instead of hanging
+        lost = pdf.concurrent.futures.Future()
+        lost.set_exception(pdf.concurrent.futures.process.BrokenProcessPool("worker killed"))
+        lost.executor = executor
+        replies = []
+        pdf._serve_stream(type('Broken', (), {'submit': lambda self, job: lost, 'restart': pool.restart})(),
+                          [json.dumps(job)], lambda text: replies.append(json.loads(text)))
+        assert replies[0]['error_code'] == pdf.ERR_UNEXPECTED and not replies[0]['ok']
+        # the pool has been replaced and serves the next job
+        replies = []
+        pdf._serve_stream(pool, [json.dumps(job)], lambda text: replies.append(json.loads(text)))
+        assert replies[0]['ok'], replies
+    finally:
+        pool.close()
+
+
+def test_pipeline_runs_steps_on_the_pages_of_the_previous_step(tmp_path):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 5, password='in')
+    png = tmp_path / 'logo.png'
+    pdf.Image.new('RGB', (10, 10), (0, 0, 255)).save(png)
+    output = tmp_path / 'out.pdf'
+    pdf.run_pdf_pipeline(source, str(output), [
+        {'op': 'decrypt', 'password': 'in'},
+        {'op': 'delete_pages', 'pages': '2'},           # 1 3 4 5
+        {'op': 'duplicate_pages', 'pages': '1'},        # 1 1 3 4 5
+        {'op': 'rotate', 'angle': 90, 'pages': '2'},    # the copy of page 1 only
+        {'op': 'reverse_pages'},                        # 5 4 3 1' 1
+        {'op': 'overlay', 'overlay_pdf': str(png), 'pages': 'last'},
+        {'op': 'encrypt', 'user_password': 'out'},
+    ])
+    assert page_numbers(output, 'out') == [5, 4, 3, 1, 1]
+    reader = pdf.PdfReader(str(output))
+    assert reader.is_encrypted and reader.decrypt('out')
+    assert [page.rotation for page in reader.pages] == [0, 0, 0, 90, 0]
+    assert [bool(page.images) for page in reader.pages] == [False, False, False, False, True]
+
+
+def test_pipeline_cli_matches_separate_operations(tmp_path):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 6)
+    plan = json.dumps([{'op': 'delete_pages', 'pages': '1-2'}, {'op': 'reverse_pages'}, {'op': 'delete_pages', 'pages': '1'}])
+    result = run_cli('--operation', 'pipeline', '--input', source, '--plan', plan, '--output', tmp_path / 'out.pdf')
+    assert result.returncode == 0, result.stderr
+    assert page_numbers(tmp_path / 'out.pdf') == [5, 4, 3]
+
+
+@pytest.mark.parametrize('plan, exit_code, error_code', [
+    # page 5 no longer exists after the first step removed two pages
+    ([{'op': 'delete_pages', 'pages': '1-2'}, {'op': 'rotate', 'angle': 90, 'pages': '5'}], 8, 'PAGE_RANGE_ERROR'),
+    ([{'op': 'rotate', 'angle': 45}], 2, 'INVALID_ARGUMENT'),
+    ([{'op': 'explode'}], 2, 'INVALID_ARGUMENT'),
+    ([{'op': 'reverse_pages'}, {'op': 'decrypt', 'password': 'x'}], 2, 'INVALID_ARGUMENT'),
+    ([{'op': 'delete_pages', 'pages': '1-2'}, {'op': 'delete_pages', 'pages': 'all'}], 2, 'INVALID_ARGUMENT'),
+])
+def test_pipeline_rejects_invalid_steps(tmp_path, plan, exit_code, error_code):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 4)
+    output = tmp_path / 'out.pdf'
+    result = run_cli('--operation', 'pipeline', '--input', source, '--plan', json.dumps(plan), '--output', output)
+    assert result.returncode == exit_code, result.stderr
+    assert result.stderr.startswith(error_code + '::')
+    assert not output.exists()
+
+
+def test_batch_keeps_going_after_a_failing_job(tmp_path):
+    source = write_numbered_pdf(tmp_path / 'in.pdf', 3)
+    jobs = [
+        {'id': 'a', 'operation': 'reverse_pages', 'input': [source], 'output': str(tmp_path / 'a.pdf')},
+        {'id': 'bad', 'operation': 'delete_pages', 'input': [source], 'output': str(tmp_path / 'bad.pdf'), 'pages': '9'},
+        {'id': 'b', 'operation': 'rotate', 'input': [source], 'output': str(tmp_path / 'b.pdf'), 'angle': 180},
+    ]
+    jobs_file = tmp_path / 'jobs.ndjson'
+    jobs_file.write_text("".join(json.dumps(job) + "\n" for job in jobs) + "{broken\n")
+    result = run_cli('--batch', jobs_file, '--output', '-', '--workers', '2', cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert not (tmp_path / '-').exists()
+    records = {record['id']: record for record in map(json.loads, result.stdout.splitlines())}
+    assert records['a']['ok'] and records['b']['ok']
+    assert page_numbers(tmp_path / 'a.pdf') == [3, 2, 1]
+    assert (records['bad']['ok'], records['bad']['exit_code'], records['bad']['error_code']) == (False, 8, 'PAGE_RANGE_ERROR')
+    assert records['bad']['line'] == 2
+    assert records[4]['error_code'] == 'INVALID_ARGUMENT'
+    assert json.loads(result.stderr.splitlines()[-1]) == {'jobs': 4, 'ok': 2, 'failed': 2}